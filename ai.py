@@ -0,0 +1,555 @@
+"""
+    Plays the game: finds every placement the current piece can reach with the normal
+    moves, scores the boards they leave with a weighted sum of features, and looks
+    ahead through the preview queue with a beam search.
+
+    Run with: python ai.py --games 5 --depth 2 --beam 8 [--workers 4]
+"""
+import argparse
+import time
+import weakref
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from board import Board, cell_keys, zobrist_hash
+from tetrominoes import ROTATIONS, KICKS, spawn_column
+
+# Weights of the board features, from Yiyuan Lee's tuned Tetris player
+WEIGHTS = {
+    "height": -0.510066,
+    "lines": 0.760666,
+    "holes": -0.35663,
+    "bumpiness": -0.184483,
+}
+
+# A final position of a piece: its shape index, rotation, column and row
+Placement = namedtuple("Placement", "index rotation x y")
+
+
+class TranspositionCache:
+    def __init__(self, max_size=200000):
+        """
+            Creates a cache of search results keyed by board hash, so a board reached
+            by different move orders is only worked on once. Every key also holds the
+            board's width and height, since an empty board hashes to 0 at every size.
+            The least recently used result is dropped once max_size are held.
+
+            Parameters:
+                max_size (int): The most results kept at once
+
+            Returns:
+                None
+        """
+        self.max_size = max_size
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+            Looks up a result.
+
+            Parameters:
+                key (tuple): What the result is for, starting with its kind and the board hash
+
+            Returns:
+                The cached result, or None if there is none
+        """
+        result = self.results.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.results.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """
+            Stores a result.
+
+            Parameters:
+                key (tuple): What the result is for
+                result: The result, anything but None
+
+            Returns:
+                None
+        """
+        self.results[key] = result
+        if len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+            self.evictions += 1
+
+
+# Shared by every search in this process, worker processes get their own
+transpositions = TranspositionCache()
+
+
+def search_board(rows, width, height):
+    """
+        Makes a Board holding the given rows, for its collision and landing checks.
+
+        Parameters:
+            rows (list): Row bitmasks
+            width (int): Columns of the board
+            height (int): Rows of the board
+
+        Returns:
+            Board: The board. Only its rows are filled in, not its colors.
+    """
+    board = Board(width, height)
+    board.rows = rows
+    board.update_tops()
+    return board
+
+
+def reachable(board, index, rotation, x, y):
+    """
+        Finds every place a piece can come to rest from (rotation, x, y), using the
+        same moves, rotations and kicks as Piece, so soft drop tucks and spins count.
+
+        Parameters:
+            board (Board): The board
+            index (int): The shape index of the piece
+            rotation (int): The starting rotation
+            x (int): The starting column
+            y (int): The starting row
+
+        Returns:
+            tuple: (list of Placement, dict of (parent state, action) keyed by state)
+    """
+    states = ROTATIONS[index]
+    start = (rotation, x, y)
+    if board.collides(states[rotation].masks, x, y):
+        return [], {}
+    parents = {start: None}
+    queue = deque([start])
+    placements = []
+    seen_cells = set()
+    while queue:
+        state = queue.popleft()
+        rotation, x, y = state
+        masks = states[rotation].masks
+        moves = [("left", (rotation, x - 1, y)), ("right", (rotation, x + 1, y)),
+                 ("down", (rotation, x, y + 1))]
+        for action, turned in (("rotate", (rotation + 1) % 4), ("rotate_ccw", (rotation - 1) % 4)):
+            for kick_x, kick_y in KICKS:
+                if not board.collides(states[turned].masks, x + kick_x, y + kick_y):
+                    moves.append((action, (turned, x + kick_x, y + kick_y)))
+                    break
+        for action, moved in moves:
+            if moved not in parents and not board.collides(states[moved[0]].masks, moved[1], moved[2]):
+                parents[moved] = (state, action)
+                queue.append(moved)
+        if board.collides(masks, x, y + 1):
+            # Rotations of symmetric shapes can cover the same cells, keep one of them
+            cells = frozenset((x + j, y + i) for j, i in states[rotation].cells)
+            if cells not in seen_cells:
+                seen_cells.add(cells)
+                placements.append(Placement(index, rotation, x, y))
+    return placements, parents
+
+
+def cached_reachable(board, index, rotation, x, y):
+    """
+        reachable, looked up in the transposition cache by the board's hash first.
+
+        Parameters:
+            board (Board): The board, with its zobrist hash up to date
+            index (int): The shape index of the piece
+            rotation (int): The starting rotation
+            x (int): The starting column
+            y (int): The starting row
+
+        Returns:
+            tuple: The same as reachable, shared so it must not be changed
+    """
+    key = ("reachable", board.width, board.height, board.zobrist, index, rotation, x, y)
+    result = transpositions.get(key)
+    if result is None:
+        result = reachable(board, index, rotation, x, y)
+        transpositions.put(key, result)
+    return result
+
+
+def drop_placements(board, index):
+    """
+        Finds the places a piece lands when it is turned and moved at the top of the
+        board and then hard dropped. Much quicker than reachable, so it is used for
+        the pieces of the lookahead.
+
+        Parameters:
+            board (Board): The board, with its column tops up to date
+            index (int): The shape index of the piece
+
+        Returns:
+            list: Placement for each landing spot
+    """
+    placements = []
+    seen_cells = set()
+    for rotation, state in enumerate(ROTATIONS[index]):
+        for x in range(board.width - state.width + 1):
+            if board.collides(state.masks, x, 0):
+                continue
+            y = board.landing_y(state.masks, state.bottoms, x, 0)
+            cells = frozenset((x + j, y + i) for j, i in state.cells)
+            if cells not in seen_cells:
+                seen_cells.add(cells)
+                placements.append(Placement(index, rotation, x, y))
+    return placements
+
+
+def path_to(parents, placement):
+    """
+        Works out the actions that bring a piece to a placement and lock it there.
+
+        Parameters:
+            parents (dict): The parents returned by reachable
+            placement (Placement): One of the placements returned by reachable
+
+        Returns:
+            list: (action, (index, rotation, x, y) of the piece after it), the last
+                action being the "drop" that locks the piece
+    """
+    index = placement.index
+    state = (placement.rotation, placement.x, placement.y)
+    steps = []
+    while parents[state] is not None:
+        parent, action = parents[state]
+        steps.append((action, (index,) + state))
+        state = parent
+    steps.reverse()
+    # The moves straight down at the end are done by the hard drop
+    while steps and steps[-1][0] == "down":
+        steps.pop()
+    steps.append(("drop", None))
+    return steps
+
+
+def place(rows, placement, width, zobrist):
+    """
+        Locks a placement into a copy of the rows and removes the full rows.
+
+        Parameters:
+            rows (list): Row bitmasks
+            placement (Placement): Where the piece goes
+            width (int): Columns of the board
+            zobrist (int): The hash of rows
+
+        Returns:
+            tuple: (new rows, number of lines cleared, hash of the new rows), or
+                None if part of the piece would be above the top of the board
+    """
+    rows = list(rows)
+    # A spawned worker never builds a Board, so its keys are made here
+    keys = cell_keys(len(rows) * width)
+    state = ROTATIONS[placement.index][placement.rotation]
+    for i, mask in enumerate(state.masks):
+        row_y = placement.y + i
+        if row_y < 0:
+            return None
+        rows[row_y] |= mask << placement.x
+    for j, i in state.cells:
+        zobrist ^= keys[(placement.y + i) * width + placement.x + j]
+    # Only the rows the piece went into can have become full
+    full_row = (1 << width) - 1
+    full = [y for y in range(placement.y, placement.y + len(state.masks)) if rows[y] == full_row]
+    lines = len(full)
+    if lines:
+        for y in reversed(full):
+            del rows[y]
+        rows[0:0] = [0] * lines
+        zobrist = zobrist_hash(rows, width)
+    return rows, lines, zobrist
+
+
+def features(rows, width):
+    """
+        Measures a board for evaluate.
+
+        Parameters:
+            rows (list): Row bitmasks, top row first
+            width (int): Columns of the board
+
+        Returns:
+            tuple: (aggregate column height, holes, bumpiness)
+    """
+    height = len(rows)
+    heights = [0] * width
+    holes = 0
+    # Columns that have a filled cell in some row above
+    cover = 0
+    full_row = (1 << width) - 1
+    y = 0
+    while y < height and not rows[y]:
+        y += 1
+    for y in range(y, height):
+        row = rows[y]
+        covered = cover & ~row
+        if covered:
+            holes += bin(covered).count("1")
+        if cover != full_row:
+            new = row & ~cover
+            while new:
+                low = new & -new
+                heights[low.bit_length() - 1] = height - y
+                new ^= low
+            cover |= row
+    bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+    return sum(heights), holes, bumpiness
+
+
+def evaluate(rows, lines, width, weights=WEIGHTS, zobrist=None):
+    """
+        Scores a board, higher is better.
+
+        Parameters:
+            rows (list): Row bitmasks
+            lines (int): Lines cleared getting there
+            width (int): Columns of the board
+            weights (dict): The weight of each feature
+            zobrist (int): The hash of rows, to look the features up in the
+                transposition cache, or None to always work them out
+
+        Returns:
+            float: The score
+    """
+    if zobrist is None:
+        height, holes, bumpiness = features(rows, width)
+    else:
+        key = ("features", width, len(rows), zobrist)
+        measured = transpositions.get(key)
+        if measured is None:
+            measured = features(rows, width)
+            transpositions.put(key, measured)
+        height, holes, bumpiness = measured
+    return (weights["height"] * height + weights["lines"] * lines
+            + weights["holes"] * holes + weights["bumpiness"] * bumpiness)
+
+
+def beam_search(rows, pieces, width, height, weights=WEIGHTS, beam_width=8, zobrist=None):
+    """
+        Drops each piece in turn on the best boards found so far, keeping the
+        beam_width best boards at every depth.
+
+        Parameters:
+            rows (list): Row bitmasks of the board to start from
+            pieces (list): Shape indexes to place, in order
+            width (int): Columns of the board
+            height (int): Rows of the board
+            weights (dict): The weight of each feature
+            beam_width (int): Boards kept at each depth
+            zobrist (int): The hash of rows, worked out if None
+
+        Returns:
+            float: The score of the best board at the end, or None if the first
+                piece cannot be placed
+    """
+    if zobrist is None:
+        zobrist = zobrist_hash(rows, width)
+    beam = [(0, rows, zobrist)]
+    best = None
+    for index in pieces:
+        candidates = []
+        for lines, rows, zobrist in beam:
+            key = ("drops", width, height, zobrist, index)
+            placements = transpositions.get(key)
+            if placements is None:
+                placements = drop_placements(search_board(rows, width, height), index)
+                transpositions.put(key, placements)
+            for placement in placements:
+                placed = place(rows, placement, width, zobrist)
+                if placed is None:
+                    continue
+                new_rows, cleared, new_zobrist = placed
+                total = lines + cleared
+                candidates.append((evaluate(new_rows, total, width, weights, new_zobrist),
+                                   total, new_rows, new_zobrist))
+        if not candidates:
+            break
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        best = candidates[0][0]
+        beam = [(total, new_rows, new_zobrist) for _, total, new_rows, new_zobrist in candidates[:beam_width]]
+    return best
+
+
+def score_root(rows, placement, pieces, width, height, weights, beam_width, zobrist):
+    """
+        Scores one placement of the current piece by searching the pieces after it.
+        Module level so it can run in a worker process.
+
+        Parameters:
+            rows (list): Row bitmasks of the board
+            placement (Placement): The placement of the current piece
+            pieces (list): Shape indexes that come after it
+            width (int): Columns of the board
+            height (int): Rows of the board
+            weights (dict): The weight of each feature
+            beam_width (int): Boards kept at each depth
+            zobrist (int): The hash of rows
+
+        Returns:
+            float: The score, or None if the placement tops out
+    """
+    placed = place(rows, placement, width, zobrist)
+    if placed is None:
+        return None
+    new_rows, lines, new_zobrist = placed
+    if not pieces:
+        return evaluate(new_rows, lines, width, weights, new_zobrist)
+    best = beam_search(new_rows, pieces, width, height, weights, beam_width, new_zobrist)
+    if best is None:
+        return evaluate(new_rows, lines, width, weights, new_zobrist) - 1000
+    # Lines cleared by the current piece are counted again on top of the lookahead
+    return best + weights["lines"] * lines
+
+
+class Planner:
+    def __init__(self, weights=WEIGHTS, depth=2, beam_width=8, executor=None):
+        """
+            Chooses moves for an Engine.
+
+            Parameters:
+                weights (dict): The weight of each feature
+                depth (int): Pieces looked at, 1 for only the current one
+                beam_width (int): Boards kept at each depth of the lookahead
+                executor (Executor): If given, the placements of the current piece
+                    are scored in its worker processes
+
+            Returns:
+                None
+        """
+        self.weights = weights
+        self.depth = depth
+        self.beam_width = beam_width
+        self.executor = executor
+
+    def choose(self, engine):
+        """
+            Finds the best moves for the current piece, trying the held piece too.
+
+            Parameters:
+                engine (Engine): The game
+
+            Returns:
+                list: (action, (index, rotation, x, y) of the piece after it) for
+                    every action that places the piece, or [] if it has nowhere to go
+        """
+        board = engine.board
+        piece = engine.current_piece
+        queue = list(engine.randomizer.peek(self.depth))
+        options = [(None, piece.index, piece.rotation, piece.x, piece.y, queue[:self.depth - 1])]
+        if not engine.hold_used:
+            if engine.hold_piece is not None:
+                held = engine.hold_piece.index
+                rotation = engine.hold_piece.rotation
+                options.append(("hold", held, rotation, spawn_column(ROTATIONS[held][rotation], board.width),
+                                0, queue[:self.depth - 1]))
+            else:
+                held = queue[0]
+                options.append(("hold", held, 0, spawn_column(ROTATIONS[held][0], board.width),
+                                0, queue[1:self.depth]))
+
+        roots = []
+        for action, index, rotation, x, y, rest in options:
+            placements, parents = cached_reachable(board, index, rotation, x, y)
+            prefix = [] if action is None else [(action, (index, rotation, x, y))]
+            for placement in placements:
+                roots.append((prefix, parents, placement, rest))
+        if not roots:
+            return []
+        args = [(list(board.rows), placement, rest, board.width, board.height, self.weights, self.beam_width,
+                 board.zobrist) for _, _, placement, rest in roots]
+        if self.executor is None:
+            scores = [score_root(*arg) for arg in args]
+        else:
+            scores = list(self.executor.map(score_root, *zip(*args), chunksize=max(1, len(args) // 16)))
+        best = max(range(len(roots)), key=lambda i: float("-inf") if scores[i] is None else scores[i])
+        prefix, parents, placement, _ = roots[best]
+        return prefix + path_to(parents, placement)
+
+
+class AutoPlayer:
+    def __init__(self, planner=None):
+        """
+            Plays a game one action at a time, planning again whenever the piece is not
+            where the plan expects it, such as after gravity moved it.
+
+            Parameters:
+                planner (Planner): Chooses the moves, a default one if None
+
+            Returns:
+                None
+        """
+        self.planner = Planner() if planner is None else planner
+        # (action, where the piece should be after it) still to come
+        self.plan = deque()
+        self.expected = None
+
+    def next_action(self, engine):
+        """
+            Returns the next action to apply.
+
+            Parameters:
+                engine (Engine): The game
+
+            Returns:
+                str: One of engine.ACTIONS
+        """
+        piece = engine.current_piece
+        state = (piece.index, piece.rotation, piece.x, piece.y)
+        if not self.plan or state != self.expected:
+            self.plan = deque(self.planner.choose(engine) or [("drop", None)])
+        action, self.expected = self.plan.popleft()
+        return action
+
+
+# One AutoPlayer per engine for ai_policy
+players = weakref.WeakKeyDictionary()
+
+
+def ai_policy(engine, rng):
+    """
+        A simulate.py policy that plays with the default Planner.
+
+        Parameters:
+            engine (Engine): The game being played
+            rng (random.Random): The policy's own random generator, not used
+
+        Returns:
+            str: The action to apply
+    """
+    if engine not in players:
+        players[engine] = AutoPlayer()
+    return players[engine].next_action(engine)
+
+
+def main():
+    from engine import Engine
+
+    parser = argparse.ArgumentParser(description="Let the AI play headless games.")
+    parser.add_argument("--games", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--beam", type=int, default=8)
+    parser.add_argument("--max-pieces", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=1, help="processes scoring the placements")
+    args = parser.parse_args()
+
+    executor = ProcessPoolExecutor(args.workers) if args.workers > 1 else None
+    planner = Planner(depth=args.depth, beam_width=args.beam, executor=executor)
+    for game in range(args.games):
+        engine = Engine(args.seed + game)
+        player = AutoPlayer(planner)
+        start = time.perf_counter()
+        while not engine.game_over and engine.pieces_locked < args.max_pieces:
+            engine.apply(player.next_action(engine))
+        elapsed = time.perf_counter() - start
+        print(f"seed={engine.seed} score={engine.score} lines={engine.lines_cleared} "
+              f"pieces={engine.pieces_locked} in {elapsed:.2f}s ({engine.pieces_locked / elapsed:.1f} pieces/s)")
+    if executor:
+        executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
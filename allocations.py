@@ -0,0 +1,289 @@
+"""
+    Counts the memory blocks each frame leaves allocated (retained blocks) and the time
+    spent in garbage collection, and attributes both to the Game, Engine, Piece and
+    Board methods that caused them. Temporaries freed before the frame ends are not
+    retained, so each frame also records its peak: the most bytes it had allocated
+    at once on top of what was allocated when it started. Tracing slows the game
+    down a lot, so it is only used on request.
+
+    Run with: python allocations.py --frames 300 --idle-retained-budget 20
+              --active-retained-budget 200 --peak-budget 65536
+    The run fails if an idle frame (no input) or an active frame (a key pressed)
+    retains more blocks than its budget, or if any frame peaks above --peak-budget.
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import gc
+import sys
+import tracemalloc
+from time import perf_counter_ns
+
+from board import Board
+from engine import Engine
+from game import Game
+from piece import Piece
+
+# Classes whose methods allocations are attributed to
+CLASSES = (Game, Engine, Piece, Board)
+
+
+def method_table(classes):
+    """
+        Finds the file and lines of every method of the given classes.
+
+        Parameters:
+            classes (tuple): The classes to look through
+
+        Returns:
+            dict: (first line, last line, "Class.method") lists keyed by file name
+    """
+    table = {}
+    for cls in classes:
+        for name, value in vars(cls).items():
+            function = value.fget if isinstance(value, property) else value
+            code = getattr(function, "__code__", None)
+            if code is None:
+                continue
+            last = max(line for _, _, line in code.co_lines() if line is not None)
+            table.setdefault(code.co_filename, []).append((code.co_firstlineno, last, f"{cls.__name__}.{name}"))
+    return table
+
+
+class AllocationProfiler:
+    def __init__(self, classes=CLASSES, depth=16):
+        """
+            Sets up the profiler. Nothing is traced until start is called.
+
+            Parameters:
+                classes (tuple): Classes whose methods allocations are attributed to
+                depth (int): Number of stack frames stored with each allocation
+
+            Returns:
+                None
+        """
+        self.table = method_table(classes)
+        self.depth = depth
+        self.snapshot = None
+        self.frame_start = 0
+        self.gc_start = None
+        self.gc_method = None
+        # GC pauses of the current frame, nanoseconds keyed by method
+        self.gc_times = {}
+
+    def start(self):
+        """
+            Starts tracing allocations and timing garbage collections.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        tracemalloc.start(self.depth)
+        gc.callbacks.append(self.on_gc)
+
+    def stop(self):
+        """
+            Stops tracing.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        gc.callbacks.remove(self.on_gc)
+        tracemalloc.stop()
+        self.snapshot = None
+
+    def method_at(self, filename, line):
+        """
+            Finds the method a line of code belongs to.
+
+            Parameters:
+                filename (str): The source file
+                line (int): The line number
+
+            Returns:
+                str: "Class.method", or None if the line is not in one of the methods
+        """
+        for first, last, name in self.table.get(filename, ()):
+            if first <= line <= last:
+                return name
+        return None
+
+    def on_gc(self, phase, info):
+        """
+            Called by gc before and after each collection, times it and blames the
+            innermost method on the stack.
+
+            Parameters:
+                phase (str): "start" or "stop"
+                info (dict): Details from gc
+
+            Returns:
+                None
+        """
+        if phase == "start":
+            self.gc_method = "other"
+            frame = sys._getframe()
+            while frame is not None:
+                name = self.method_at(frame.f_code.co_filename, frame.f_lineno)
+                if name:
+                    self.gc_method = name
+                    break
+                frame = frame.f_back
+            self.gc_start = perf_counter_ns()
+        elif self.gc_start is not None:
+            pause = perf_counter_ns() - self.gc_start
+            self.gc_times[self.gc_method] = self.gc_times.get(self.gc_method, 0) + pause
+            self.gc_start = None
+
+    def begin_frame(self):
+        """
+            Marks the start of a frame.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        self.gc_times = {}
+        self.snapshot = tracemalloc.take_snapshot()
+        # Taken after the snapshot, so the memory it holds is not part of the frame
+        tracemalloc.reset_peak()
+        self.frame_start = tracemalloc.get_traced_memory()[0]
+
+    def end_frame(self):
+        """
+            Works out what the frame since begin_frame left allocated and how much
+            it had allocated at its peak.
+
+            Parameters:
+                None
+
+            Returns:
+                dict: "retained_blocks" and "retained_bytes" still allocated,
+                    "peak_bytes" allocated at once during the frame, "methods" with
+                    the retained [blocks, bytes] of each method and "gc" with the
+                    nanoseconds of garbage collection during each method
+        """
+        peak = tracemalloc.get_traced_memory()[1] - self.frame_start
+        snapshot = tracemalloc.take_snapshot()
+        methods = {}
+        blocks = size = 0
+        for diff in snapshot.compare_to(self.snapshot, "traceback"):
+            # Leaves out the snapshots themselves
+            if diff.count_diff <= 0 or diff.traceback[-1].filename in (tracemalloc.__file__, __file__):
+                continue
+            name = "other"
+            for frame in reversed(diff.traceback):
+                found = self.method_at(frame.filename, frame.lineno)
+                if found:
+                    name = found
+                    break
+            entry = methods.setdefault(name, [0, 0])
+            entry[0] += diff.count_diff
+            entry[1] += max(diff.size_diff, 0)
+            blocks += diff.count_diff
+            size += max(diff.size_diff, 0)
+        self.snapshot = snapshot
+        return {"retained_blocks": blocks, "retained_bytes": size, "peak_bytes": max(peak, 0),
+                "methods": methods, "gc": self.gc_times}
+
+
+def profile_frames(game, profiler, frames, action_every=0, actions=("left", "right")):
+    """
+        Plays frames of a game with the profiler running.
+
+        Parameters:
+            game (Game): The game
+            profiler (AllocationProfiler): A started profiler
+            frames (int): Number of frames
+            action_every (int): Applies an action every this many frames, 0 never
+            actions (tuple): The actions applied in turn
+
+        Returns:
+            list: (active, the result of end_frame) for every frame
+    """
+    results = []
+    for frame in range(frames):
+        if game.game_over:
+            break
+        profiler.begin_frame()
+        active = bool(action_every) and frame % action_every == 0
+        if active:
+            game.apply(actions[frame // action_every % len(actions)])
+        game.update()
+        results.append((active, profiler.end_frame()))
+    return results
+
+
+def over_budget(results, idle_retained, active_retained, peak_bytes=None):
+    """
+        Finds the frames that retained more blocks, or peaked at more bytes, than allowed.
+
+        Parameters:
+            results (list): The output of profile_frames
+            idle_retained (int): Retained blocks allowed in a frame without an action
+            active_retained (int): Retained blocks allowed in a frame with an action
+            peak_bytes (int): Peak bytes allowed in any frame, no limit if None
+
+        Returns:
+            list: (frame number, active, result) of every frame over its budget
+    """
+    return [(number, active, result) for number, (active, result) in enumerate(results)
+            if result["retained_blocks"] > (active_retained if active else idle_retained)
+            or (peak_bytes is not None and result["peak_bytes"] > peak_bytes)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the memory blocks each frame retains and its peak.")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--action-every", type=int, default=4, help="frames between key presses")
+    parser.add_argument("--warmup", type=int, default=30, help="frames played before checking")
+    parser.add_argument("--idle-retained-budget", type=int, default=20,
+                        help="retained blocks allowed in a frame without a key press")
+    parser.add_argument("--active-retained-budget", type=int, default=200,
+                        help="retained blocks allowed in a frame with a key press")
+    parser.add_argument("--peak-budget", type=int, help="peak bytes allowed in any frame")
+    args = parser.parse_args()
+
+    game = Game(args.seed)
+    profiler = AllocationProfiler()
+    profiler.start()
+    # Fills the font, text and landing caches first, they are meant to allocate once
+    profile_frames(game, profiler, args.warmup, args.action_every)
+    results = profile_frames(game, profiler, args.frames, args.action_every)
+    profiler.stop()
+
+    totals = {}
+    gc_total = 0
+    peak = 0
+    for _, result in results:
+        for name, (blocks, size) in result["methods"].items():
+            entry = totals.setdefault(name, [0, 0])
+            entry[0] += blocks
+            entry[1] += size
+        gc_total += sum(result["gc"].values())
+        peak = max(peak, result["peak_bytes"])
+    print(f"{'method':28s}{'retained blocks':>16s}{'bytes':>12s}")
+    for name, (blocks, size) in sorted(totals.items(), key=lambda item: -item[1][0]):
+        print(f"{name:28s}{blocks:16d}{size:12d}")
+    print(f"{len(results)} frames, highest peak {peak} bytes, {gc_total / 1e6:.2f} ms in garbage collection")
+
+    failures = over_budget(results, args.idle_retained_budget, args.active_retained_budget, args.peak_budget)
+    for number, active, result in failures:
+        worst = max(result["methods"].items(), key=lambda item: item[1][0], default=("nothing", (0, 0)))
+        print(f"frame {number} ({'active' if active else 'idle'}) retained {result['retained_blocks']} blocks, "
+              f"most in {worst[0]} ({worst[1][0]}), and peaked at {result['peak_bytes']} bytes")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+import numpy as np
+
+from settings import WIDTH, HEIGHT
+from tetrominoes import ROTATIONS, PIECE_COLORS
+from engine import SCORING, LINES_PER_LEVEL
+from randomizer import Randomizer
+
+# Actions that can be given to each board in BatchEngine.step
+NOOP, LEFT, RIGHT, ROTATE, ROTATE_CCW, SOFT_DROP, HARD_DROP, HOLD = range(8)
+
+# (dx, dy, rotation change) of the actions that just try to move the piece
+MOVES = {
+    LEFT: (-1, 0, 0),
+    RIGHT: (1, 0, 0),
+    ROTATE: (0, 0, 1),
+    ROTATE_CCW: (0, 0, -1),
+    SOFT_DROP: (0, 1, 0),
+}
+
+# CELL_X[shape, rotation] and CELL_Y[shape, rotation] hold the offsets of the four cells
+CELL_X = np.array([[[x for x, _ in state.cells] for state in states] for states in ROTATIONS], np.int32)
+CELL_Y = np.array([[[y for _, y in state.cells] for state in states] for states in ROTATIONS], np.int32)
+BOX_WIDTH = np.array([[state.width for state in states] for states in ROTATIONS], np.int32)
+CELL_COLOR = np.array(PIECE_COLORS, np.uint8)
+# Points for clearing 0 to 4 lines, before the level multiplier
+LINE_SCORES = np.array([0] + [SCORING[lines] for lines in range(1, 5)], np.int64)
+
+
+class BatchEngine:
+    def __init__(self, count, seed=None, width=WIDTH, height=HEIGHT, preview=3, mode="bag"):
+        """
+            Creates count independent games that are all advanced together. The boards
+            are one (count, height, width) uint8 array of color numbers and every piece
+            field is an array with one entry per board, so each rule is applied to all
+            boards with a handful of NumPy operations. Board i is dealt the same pieces
+            as Engine(seed + i).
+
+            Parameters:
+                count (int): Number of boards
+                seed (int): Seed of the first board's pieces, random if None
+                width (int): Columns of every board
+                height (int): Rows of every board
+                preview (int): Length of the next piece queue
+                mode (str): "bag" or "random", see Randomizer
+
+            Returns:
+                None
+        """
+        self.count = count
+        self.width = width
+        self.height = height
+        self.randomizers = [Randomizer(None if seed is None else seed + i, mode) for i in range(count)]
+        self.cells = np.zeros((count, height, width), np.uint8)
+        self.queue = np.zeros((count, preview), np.int8)
+        self.piece = np.zeros(count, np.int8)
+        self.rotation = np.zeros(count, np.int8)
+        self.x = np.zeros(count, np.int32)
+        self.y = np.zeros(count, np.int32)
+        self.hold = np.full(count, -1, np.int8)
+        self.hold_rotation = np.zeros(count, np.int8)
+        self.hold_used = np.zeros(count, bool)
+        self.score = np.zeros(count, np.int64)
+        self.level = np.ones(count, np.int64)
+        self.lines_cleared = np.zeros(count, np.int64)
+        self.pieces = np.zeros(count, np.int64)
+        self.game_over = np.zeros(count, bool)
+        self.spawn(np.arange(count))
+
+    def collides(self, boards, piece, rotation, x, y):
+        """
+            Checks for every given board if a piece placed at (x, y) would overlap a
+            wall, the floor or a filled cell. Cells above the top row only check the walls.
+
+            Parameters:
+                boards (ndarray): Indexes of the boards to check
+                piece (ndarray): Shape index for each of those boards
+                rotation (ndarray): Rotation index for each board
+                x (ndarray): Column of the piece on each board
+                y (ndarray): Row of the piece on each board
+
+            Returns:
+                ndarray: One bool per board, True where the piece collides
+        """
+        xs = x[:, None] + CELL_X[piece, rotation]
+        ys = y[:, None] + CELL_Y[piece, rotation]
+        outside = (xs < 0) | (xs >= self.width) | (ys >= self.height)
+        filled = self.cells[boards[:, None],
+                            np.clip(ys, 0, self.height - 1),
+                            np.clip(xs, 0, self.width - 1)] != 0
+        return (outside | (filled & (ys >= 0))).any(axis=1)
+
+    def try_move(self, boards, dx, dy, turn):
+        """
+            Moves and/or rotates the piece on the given boards where it fits.
+
+            Parameters:
+                boards (ndarray): Indexes of the boards to move
+                dx (int): The x movement
+                dy (int): The y movement
+                turn (int): 1 to rotate clockwise, -1 counter clockwise, 0 not at all
+
+            Returns:
+                ndarray: One bool per board, True where the move was blocked
+        """
+        rotation = (self.rotation[boards] + turn) % 4
+        x = self.x[boards] + dx
+        y = self.y[boards] + dy
+        blocked = self.collides(boards, self.piece[boards], rotation, x, y)
+        moved = ~blocked
+        self.rotation[boards[moved]] = rotation[moved]
+        self.x[boards[moved]] = x[moved]
+        self.y[boards[moved]] = y[moved]
+        return blocked
+
+    def step(self, actions):
+        """
+            Applies one action to every board that is not over. A soft drop that is
+            blocked and every hard drop lock the piece, clear lines and spawn the next one,
+            the same as Piece.move(0, 1), Piece.instant_drop and Engine.step.
+
+            Parameters:
+                actions (array): One action per board, see the constants at the top
+
+            Returns:
+                ndarray: Lines cleared on each board by this step
+        """
+        actions = np.asarray(actions)
+        live = ~self.game_over
+        to_lock = []
+        for action, (dx, dy, turn) in MOVES.items():
+            boards = np.flatnonzero(live & (actions == action))
+            if boards.size:
+                blocked = self.try_move(boards, dx, dy, turn)
+                if action == SOFT_DROP:
+                    to_lock.append(boards[blocked])
+
+        boards = np.flatnonzero(live & (actions == HARD_DROP))
+        if boards.size:
+            to_lock.append(boards)
+            falling = boards
+            while falling.size:
+                falling = falling[~self.try_move(falling, 0, 1, 0)]
+
+        self.hold_pieces(np.flatnonzero(live & (actions == HOLD)))
+
+        cleared = np.zeros(self.count, np.int64)
+        if to_lock:
+            boards = np.concatenate(to_lock)
+            if boards.size:
+                cleared[boards] = self.lock(boards)
+        return cleared
+
+    def tick(self):
+        """
+            Applies one gravity tick to every board.
+
+            Parameters:
+                None
+
+            Returns:
+                ndarray: Lines cleared on each board
+        """
+        return self.step(np.full(self.count, SOFT_DROP))
+
+    def lock(self, boards):
+        """
+            Writes the current piece into the given boards, removes full rows, adds
+            the score and spawns the next pieces.
+
+            Parameters:
+                boards (ndarray): Indexes of the boards whose piece locks
+
+            Returns:
+                ndarray: Lines cleared on each of those boards
+        """
+        piece = self.piece[boards]
+        rotation = self.rotation[boards]
+        xs = self.x[boards][:, None] + CELL_X[piece, rotation]
+        ys = self.y[boards][:, None] + CELL_Y[piece, rotation]
+        colors = np.broadcast_to(CELL_COLOR[piece][:, None], xs.shape)
+        owners = np.broadcast_to(boards[:, None], xs.shape)
+        # Parts of a piece above the top row are dropped, like Board.lock
+        visible = ys >= 0
+        self.cells[owners[visible], ys[visible], xs[visible]] = colors[visible]
+
+        # Only the rows the pieces went into can have become full
+        rows = np.clip(ys, 0, None)
+        touched_full = (self.cells[owners, rows] != 0).all(axis=2) & visible
+        full = np.zeros((len(boards), self.height), bool)
+        full[np.broadcast_to(np.arange(len(boards))[:, None], ys.shape)[touched_full], ys[touched_full]] = True
+        cleared = full.sum(axis=1)
+        some = cleared > 0
+        if some.any():
+            changed = boards[some]
+            # A stable sort on "row is kept" moves the full rows to the top in order
+            order = np.argsort(~full[some], axis=1, kind="stable")
+            compacted = np.take_along_axis(self.cells[changed], order[:, :, None], axis=1)
+            compacted[np.arange(self.height)[None, :] < cleared[some][:, None]] = 0
+            self.cells[changed] = compacted
+
+        self.score[boards] += LINE_SCORES[np.minimum(cleared, 4)] * self.level[boards]
+        self.lines_cleared[boards] += cleared
+        self.level[boards] = 1 + self.lines_cleared[boards] // LINES_PER_LEVEL
+        self.pieces[boards] += 1
+        self.spawn(boards)
+        return cleared
+
+    def spawn(self, boards):
+        """
+            Deals the next piece to each given board and checks for game over.
+
+            Parameters:
+                boards (ndarray): Indexes of the boards that need a new piece
+
+            Returns:
+                None
+        """
+        preview = self.queue.shape[1]
+        for board in boards:
+            randomizer = self.randomizers[board]
+            self.piece[board] = randomizer.next()
+            self.queue[board] = randomizer.peek(preview)
+        piece = self.piece[boards]
+        self.rotation[boards] = 0
+        self.x[boards] = self.width // 2 - BOX_WIDTH[piece, 0] // 2
+        self.y[boards] = 0
+        self.hold_used[boards] = False
+        self.game_over[boards] |= self.collides(boards, piece, self.rotation[boards],
+                                                self.x[boards], self.y[boards])
+
+    def hold_pieces(self, boards):
+        """
+            Swaps the current piece with the held one on the given boards, the same as
+            Engine.hold_current_piece. Boards that already held this turn are skipped.
+
+            Parameters:
+                boards (ndarray): Indexes of the boards that asked to hold
+
+            Returns:
+                None
+        """
+        boards = boards[~self.hold_used[boards]]
+        if not boards.size:
+            return
+        empty = self.hold[boards] == -1
+        first = boards[empty]
+        self.hold[first] = self.piece[first]
+        self.hold_rotation[first] = self.rotation[first]
+        self.spawn(first)
+
+        swap = boards[~empty]
+        self.piece[swap], self.hold[swap] = self.hold[swap], self.piece[swap]
+        self.rotation[swap], self.hold_rotation[swap] = self.hold_rotation[swap], self.rotation[swap]
+        self.x[swap] = self.width // 2 - BOX_WIDTH[self.piece[swap], self.rotation[swap]] // 2
+        self.y[swap] = 0
+        self.hold_used[boards] = True
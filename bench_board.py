@@ -0,0 +1,276 @@
+"""
+    Compares the old list-of-lists grid with the bitmask Board on the same move sequences.
+
+    Run with: python bench_board.py [games] [seed]
+    The run fails if the boards disagree, or if the games clear fewer than
+    MIN_LINES_PER_GAME lines each on average, too few to compare the clearing code.
+"""
+import random
+import sys
+import time
+
+from settings import WIDTH, HEIGHT, SHAPES
+from board import Board, shape_masks
+
+MIN_LINES_PER_GAME = 10
+
+
+def list_is_valid(grid, shape, x, y):
+    """
+        The collision check the game used before Board, kept here as the baseline.
+
+        Parameters:
+            grid (list): List of rows, each a list of cells
+            shape (list): The nested list shape of the piece
+            x (int): The column of the piece
+            y (int): The row of the piece
+
+        Returns:
+            Boolean: True if the piece collides, False if not
+    """
+    for i, row in enumerate(shape):
+        for j, cell in enumerate(row):
+            if cell:
+                new_x = x + j
+                new_y = y + i
+                if new_x < 0 or new_x >= WIDTH or new_y >= HEIGHT:
+                    return True
+                if new_y >= 0 and grid[new_y][new_x] != 0:
+                    return True
+    return False
+
+
+def list_lock_and_clear(grid, shape, x, y, color):
+    """
+        Locks a piece and clears full rows the way the game used to.
+
+        Parameters:
+            grid (list): List of rows, each a list of cells
+            shape (list): The nested list shape of the piece
+            x (int): The column of the piece
+            y (int): The row of the piece
+            color (int): The color number of the piece
+
+        Returns:
+            int: The number of rows cleared
+    """
+    for i, row in enumerate(shape):
+        for j, cell in enumerate(row):
+            if cell and y + i >= 0:
+                grid[y + i][x + j] = color
+    cleared = 0
+    new_grid = []
+    for row in grid:
+        if 0 not in row:
+            cleared += 1
+        else:
+            new_grid.append(row)
+    for _ in range(cleared):
+        new_grid.insert(0, [0 for _ in range(WIDTH)])
+    for i in range(HEIGHT):
+        grid[i] = new_grid[i]
+    return cleared
+
+
+def best_placement(board, index, rng):
+    """
+        Picks where a piece should go to fill rows: the placement that clears the most
+        rows, then leaves the fewest holes under it, then lands lowest.
+
+        Parameters:
+            board (Board): The board the piece is played on
+            index (int): The shape index of the piece
+            rng (Random): Breaks ties between equally good placements
+
+        Returns:
+            tuple: (clockwise turns, column of the piece)
+    """
+    shape = SHAPES[index][1]
+    best = None
+    for turns in range(4):
+        masks = shape_masks(shape)
+        bottoms = [max(i for i, mask in enumerate(masks) if mask >> j & 1) for j in range(len(shape[0]))]
+        for x in range(WIDTH - len(shape[0]) + 1):
+            y = min(board.tops[x + j] - 1 - bottom for j, bottom in enumerate(bottoms))
+            if y < 0:
+                continue
+            cleared = sum(board.rows[y + i] | mask << x == board.full_row for i, mask in enumerate(masks))
+            holes = sum(board.tops[x + j] - 1 - (y + bottom) for j, bottom in enumerate(bottoms))
+            score = (-cleared, holes, -y, rng.random())
+            if best is None or score < best[0]:
+                best = (score, turns, x)
+        shape = rotate(shape)
+    return (0, WIDTH // 2) if best is None else best[1:]
+
+
+def make_moves(games, seed):
+    """
+        Generates the move sequences both boards will play. Each piece is steered to
+        the column that best fills the rows under it, so the games clear lines often
+        and the clearing code is compared as well as the collision checks.
+
+        Parameters:
+            games (int): Number of games to generate
+            seed (int): Seed of the random generator
+
+        Returns:
+            list: One list of (shape index, [(dx, rotations), ...]) per game
+    """
+    rng = random.Random(seed)
+    sequences = []
+    for _ in range(games):
+        board = Board()
+        pieces = []
+        for _ in range(200):
+            index = rng.randrange(len(SHAPES))
+            turns, target = best_placement(board, index, rng)
+            shift = target - (WIDTH // 2 - len(SHAPES[index][1][0]) // 2)
+            step = 1 if shift > 0 else -1
+            moves = [(0, 1)] * turns + [(step, 0)] * abs(shift)
+            pieces.append((index, moves))
+            # Plays the piece as play_board will, so the next one is placed on the real stack
+            if play_piece(board, index, moves) is None:
+                break
+        sequences.append(pieces)
+    return sequences
+
+
+def rotate(shape):
+    """
+        Rotates a nested list shape clockwise, like Piece.rotate.
+
+        Parameters:
+            shape (list): The nested list shape of a piece
+
+        Returns:
+            list: The rotated shape
+    """
+    return [list(row) for row in zip(*shape[::-1])]
+
+
+def play_lists(sequences):
+    """
+        Plays every sequence on a list-of-lists grid.
+
+        Parameters:
+            sequences (list): The output of make_moves
+
+        Returns:
+            tuple: (number of collision checks, lines cleared)
+    """
+    checks = lines = 0
+    for pieces in sequences:
+        grid = [[0] * WIDTH for _ in range(HEIGHT)]
+        for index, moves in pieces:
+            shape = SHAPES[index][1]
+            x, y = WIDTH // 2 - len(shape[0]) // 2, 0
+            checks += 1
+            if list_is_valid(grid, shape, x, y):
+                break
+            for dx, turns in moves:
+                if turns:
+                    new_shape = rotate(shape)
+                    checks += 1
+                    if not list_is_valid(grid, new_shape, x, y):
+                        shape = new_shape
+                checks += 1
+                if not list_is_valid(grid, shape, x + dx, y):
+                    x += dx
+                checks += 1
+                if not list_is_valid(grid, shape, x, y + 1):
+                    y += 1
+            while True:
+                checks += 1
+                if list_is_valid(grid, shape, x, y + 1):
+                    break
+                y += 1
+            lines += list_lock_and_clear(grid, shape, x, y, index + 1)
+    return checks, lines
+
+
+def play_piece(board, index, moves):
+    """
+        Plays one piece on a bitmask Board, the way play_lists plays it on a grid.
+
+        Parameters:
+            board (Board): The board
+            index (int): The shape index of the piece
+            moves (list): The (dx, rotations) of each step down
+
+        Returns:
+            tuple: (number of collision checks, lines cleared), or None if the piece
+                could not spawn
+    """
+    shape = SHAPES[index][1]
+    masks = shape_masks(shape)
+    x, y = WIDTH // 2 - len(shape[0]) // 2, 0
+    checks = 1
+    if board.collides(masks, x, y):
+        return None
+    for dx, turns in moves:
+        if turns:
+            new_shape = rotate(shape)
+            new_masks = shape_masks(new_shape)
+            checks += 1
+            if not board.collides(new_masks, x, y):
+                shape, masks = new_shape, new_masks
+        checks += 1
+        if not board.collides(masks, x + dx, y):
+            x += dx
+        checks += 1
+        if not board.collides(masks, x, y + 1):
+            y += 1
+    while True:
+        checks += 1
+        if board.collides(masks, x, y + 1):
+            break
+        y += 1
+    board.lock(masks, x, y, index + 1)
+    return checks, board.clear_full_rows()
+
+
+def play_board(sequences):
+    """
+        Plays every sequence on a bitmask Board.
+
+        Parameters:
+            sequences (list): The output of make_moves
+
+        Returns:
+            tuple: (number of collision checks, lines cleared)
+    """
+    checks = lines = 0
+    for pieces in sequences:
+        board = Board()
+        for index, moves in pieces:
+            result = play_piece(board, index, moves)
+            if result is None:
+                checks += 1
+                break
+            checks += result[0]
+            lines += result[1]
+    return checks, lines
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    sequences = make_moves(games, seed)
+    results = {}
+    for name, play in (("lists", play_lists), ("bitboard", play_board)):
+        start = time.perf_counter()
+        checks, lines = play(sequences)
+        elapsed = time.perf_counter() - start
+        results[name] = (checks, lines)
+        print(f"{name:9s} {elapsed * 1000:8.1f} ms  {checks / elapsed:12,.0f} checks/s  lines={lines}")
+    if results["lists"] != results["bitboard"]:
+        print("boards disagree:", results)
+        sys.exit(1)
+    if results["lists"][1] < games * MIN_LINES_PER_GAME:
+        print(f"only {results['lists'][1]} lines cleared in {games} games, "
+              f"at least {games * MIN_LINES_PER_GAME} expected")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
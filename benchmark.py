@@ -0,0 +1,265 @@
+"""
+    Times the hot paths of the game on generated boards and compares them with a baseline.
+    Runs on the dummy SDL video driver, so no window is opened.
+
+    Run with: python benchmark.py --save        measure and store the baseline
+              python benchmark.py               measure and compare with the baseline
+    A benchmark that is more than --threshold slower than its baseline fails the run, and
+    so does a run without a baseline. Timings depend on the machine, so the baseline is
+    not committed; save one on the machine that runs the comparison.
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from settings import WIDTH, HEIGHT
+from board import Board
+from game import Game
+from piece import Piece
+from snapshot import snapshot, restore
+
+BASELINE = "benchmark_baseline.json"
+
+
+def make_board(filled_rows, holes, seed, width=WIDTH, height=HEIGHT):
+    """
+        Makes a board whose bottom rows are filled apart from a few holes per row, so
+        none of them is full.
+
+        Parameters:
+            filled_rows (int): Number of rows filled from the bottom
+            holes (int): Empty cells left in each of those rows
+            seed (int): Seed for the hole positions and colors
+            width (int): Columns of the board
+            height (int): Rows of the board
+
+        Returns:
+            Board: The board
+    """
+    rng = random.Random(seed)
+    board = Board(width, height)
+    for y in range(height - filled_rows, height):
+        empty = set(rng.sample(range(width), holes))
+        for x in range(width):
+            if x not in empty:
+                board.lock([1], x, y, rng.randint(1, 7))
+    return board
+
+
+# The board states every benchmark is run on
+BOARDS = {
+    "empty": lambda: make_board(0, 0, 0),
+    "half_full": lambda: make_board(HEIGHT // 2, 1, 1),
+    "near_top_out": lambda: make_board(HEIGHT - 4, 1, 2),
+    "garbage": lambda: make_board(HEIGHT * 3 // 4, 3, 3),
+}
+
+
+def fill_bottom_row(board):
+    """
+        Fills the holes of the bottom row, so the next clear_lines has a row to remove.
+
+        Parameters:
+            board (Board): The board to change
+
+        Returns:
+            None
+    """
+    board.lock([board.full_row & ~board.rows[board.height - 1]], 0, board.height - 1, 1)
+
+
+def move_back_and_forth(game):
+    """
+        Moves the current piece one column, alternating directions, so the next frame
+        has something to redraw.
+
+        Parameters:
+            game (Game): The game
+
+        Returns:
+            None
+    """
+    game.apply("left" if game.current_piece.x % 2 else "right")
+
+
+def cases(game, board):
+    """
+        Lists the benchmarks to run on one game.
+
+        Parameters:
+            game (Game): A game playing on a copy of board
+            board (Board): The generated board, which is left as it is
+
+        Returns:
+            list: (name, setup, run) for every benchmark. setup is called before each
+                timed call of run and is not timed, run is given what setup returns.
+    """
+    piece = game.current_piece
+
+    def new_piece():
+        return Piece(piece.index, board.copy())
+
+    def board_with_full_row():
+        game.board.rows[:] = board.rows
+        game.board.colors[:] = board.colors
+        game.board.update_tops()
+        fill_bottom_row(game.board)
+
+    def stale_grid():
+        game.forget_grid()
+
+    def stale_ghost():
+        piece.landing_key = None
+        game.piece_rects = []
+
+    def next_frame():
+        move_back_and_forth(game)
+
+    def full_frame():
+        game.redraw_all = True
+
+    return [
+        ("is_valid", None, lambda _: piece.is_valid(0, 1)),
+        ("rotate", None, lambda _: piece.rotate()),
+        ("instant_drop", new_piece, lambda new: new.instant_drop()),
+        ("clear_lines", board_with_full_row, lambda _: game.clear_lines()),
+        ("draw_grid", stale_grid, lambda _: game.draw_grid()),
+        ("draw_ghost_piece", stale_ghost, lambda _: game.draw_ghost_piece()),
+        ("side_panel", None, lambda _: game.side_panel()),
+        ("update", next_frame, lambda _: game.update()),
+        ("update_full", full_frame, lambda _: game.update()),
+        ("snapshot", None, lambda _: snapshot(game)),
+        ("restore", lambda: snapshot(game), lambda data: restore(game, data)),
+    ]
+
+
+def percentile(times, fraction):
+    """
+        Picks a percentile out of sorted times.
+
+        Parameters:
+            times (list): Sorted times
+            fraction (float): 0.5 for the median, 0.99 for the 99th percentile
+
+        Returns:
+            int: The time at that percentile
+    """
+    return times[min(len(times) - 1, int(len(times) * fraction))]
+
+
+def measure(setup, run, seconds, max_calls):
+    """
+        Calls run over and over, timing each call on its own.
+
+        Parameters:
+            setup (function): Called untimed before each call, or None
+            run (function): The code being measured
+            seconds (float): Time after which no more calls are made
+            max_calls (int): Most calls made
+
+        Returns:
+            dict: Calls per second, worked out from the median so a few slow calls do not
+                move it, and the 50th, 95th and 99th percentile call time in microseconds
+    """
+    times = []
+    deadline = time.perf_counter() + seconds
+    while len(times) < max_calls and (len(times) < 10 or time.perf_counter() < deadline):
+        arg = setup() if setup else None
+        start = time.perf_counter_ns()
+        run(arg)
+        times.append(time.perf_counter_ns() - start)
+    times.sort()
+    return {
+        "ops_per_sec": 1e9 / max(percentile(times, 0.5), 1),
+        "p50_us": percentile(times, 0.5) / 1000,
+        "p95_us": percentile(times, 0.95) / 1000,
+        "p99_us": percentile(times, 0.99) / 1000,
+    }
+
+
+def run_all(seconds, max_calls, only=None):
+    """
+        Runs every benchmark on every generated board.
+
+        Parameters:
+            seconds (float): Time spent on each benchmark
+            max_calls (int): Most calls made for each benchmark
+            only (str): If given, only benchmarks whose name contains it are run
+
+        Returns:
+            dict: The results of measure, keyed by "benchmark/board"
+    """
+    results = {}
+    for board_name, make in BOARDS.items():
+        board = make()
+        game = Game(seed=1, board=board.copy())
+        for name, setup, run in cases(game, board):
+            key = f"{name}/{board_name}"
+            if only and only not in key:
+                continue
+            results[key] = measure(setup, run, seconds, max_calls)
+            print(f"{key:30s}{results[key]['ops_per_sec']:14,.0f} ops/s"
+                  f"{results[key]['p50_us']:10.1f}{results[key]['p95_us']:10.1f}{results[key]['p99_us']:10.1f} us",
+                  flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+        Finds the benchmarks that got slower than the baseline allows.
+
+        Parameters:
+            results (dict): The output of run_all
+            baseline (dict): An earlier output of run_all
+            threshold (float): Allowed slowdown, 0.25 for 25% fewer ops/sec
+
+        Returns:
+            list: (key, baseline ops/sec, new ops/sec) for every regression
+    """
+    regressions = []
+    for key, result in results.items():
+        if key in baseline:
+            old = baseline[key]["ops_per_sec"]
+            if result["ops_per_sec"] < old * (1 - threshold):
+                regressions.append((key, old, result["ops_per_sec"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the game's hot paths.")
+    parser.add_argument("--seconds", type=float, default=0.3, help="time spent on each benchmark")
+    parser.add_argument("--max-calls", type=int, default=20000)
+    parser.add_argument("--only", help="only run benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing")
+    args = parser.parse_args()
+    # Comparing with nothing would always pass, so a missing baseline fails the run
+    if not args.save and not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --save to make one")
+        sys.exit(1)
+
+    print(f"{'benchmark':30s}{'speed':>20s}{'p50':>10s}{'p95':>10s}{'p99':>10s}")
+    results = run_all(args.seconds, args.max_calls, args.only)
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"saved baseline to {args.baseline}")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for key, old, new in regressions:
+        print(f"REGRESSION {key}: {old:,.0f} -> {new:,.0f} ops/s ({new / old - 1:+.0%})")
+    if regressions:
+        sys.exit(1)
+    print(f"no regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
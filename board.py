@@ -0,0 +1,401 @@
+import random
+from array import array
+
+from settings import WIDTH, HEIGHT
+
+# Random 64 bit key of every cell, indexed by y * width + x, for Zobrist hashing.
+# They come from a fixed seed, so a board hashes the same in every run. Kept as
+# 8 byte machine ints, a board hundreds of cells wide has a lot of them.
+CELL_KEYS = array("Q")
+KEY_SOURCE = random.Random("zobrist")
+
+
+def cell_keys(count):
+    """
+        Makes sure there is a key for at least count cells.
+
+        Parameters:
+            count (int): Number of cells
+
+        Returns:
+            array.array: CELL_KEYS
+    """
+    while len(CELL_KEYS) < count:
+        CELL_KEYS.append(KEY_SOURCE.getrandbits(64))
+    return CELL_KEYS
+
+
+# ROW_TABLES[width][y] holds, for each group of GROUP_BITS columns of row y, the
+# XOR of the keys of every combination of filled cells in the group
+GROUP_BITS = 5
+GROUP_MASK = (1 << GROUP_BITS) - 1
+ROW_TABLES = {}
+
+
+def row_tables(width, rows):
+    """
+        Makes sure the row key tables of a board width cover at least rows rows.
+
+        Parameters:
+            width (int): Columns of the board
+            rows (int): Number of rows
+
+        Returns:
+            list: ROW_TABLES[width]
+    """
+    tables = ROW_TABLES.setdefault(width, [])
+    keys = cell_keys(rows * width)
+    while len(tables) < rows:
+        offset = len(tables) * width
+        groups = []
+        for start in range(0, width, GROUP_BITS):
+            table = array("Q", bytes(8 * (GROUP_MASK + 1)))
+            for bits in range(1, GROUP_MASK + 1):
+                low = bits & -bits
+                column = start + low.bit_length() - 1
+                if column < width:
+                    table[bits] = table[bits ^ low] ^ keys[offset + column]
+            groups.append(table)
+        tables.append(groups)
+    return tables
+
+
+def row_key(y, row, width):
+    """
+        XORs together the keys of the filled cells of one row.
+
+        Parameters:
+            y (int): The row index
+            row (int): The row bitmask
+            width (int): Columns of the board
+
+        Returns:
+            int: The row's part of the board hash
+    """
+    tables = ROW_TABLES.get(width)
+    if tables is None or len(tables) <= y:
+        tables = row_tables(width, y + 1)
+    key = 0
+    for table in tables[y]:
+        key ^= table[row & GROUP_MASK]
+        row >>= GROUP_BITS
+    return key
+
+
+def zobrist_hash(rows, width):
+    """
+        Hashes which cells of a board are filled, the same value Board.zobrist keeps.
+
+        Parameters:
+            rows (list): Row bitmasks
+            width (int): Columns of the board
+
+        Returns:
+            int: 64 bit hash, 0 for an empty board
+    """
+    cell_keys(len(rows) * width)
+    key = 0
+    for y, row in enumerate(rows):
+        if row:
+            key ^= row_key(y, row, width)
+    return key
+
+
+def shape_masks(shape):
+    """
+        Turns a piece shape into one bitmask per row, bit 0 being the leftmost column.
+
+        Parameters:
+            shape (list): The nested list shape of a piece
+
+        Returns:
+            list: The row masks of the shape, top row first
+    """
+    return [sum(1 << j for j, cell in enumerate(row) if cell) for row in shape]
+
+
+class Board:
+    def __init__(self, width=WIDTH, height=HEIGHT):
+        """
+            Creates an empty board. Each row is stored as an int where bit x is set
+            when column x is filled, and the color of every cell is kept in a
+            separate bytearray for the renderer.
+
+            Parameters:
+                width (int): Number of columns
+                height (int): Number of rows
+
+            Returns:
+                None
+        """
+        self.width = width
+        self.height = height
+        self.full_row = (1 << width) - 1
+        self.rows = [0] * height
+        self.colors = bytearray(width * height)
+        # Row of the highest filled cell in each column, height if the column is empty
+        self.tops = [height] * width
+        # Goes up every time a cell changes, so the renderer knows when to redraw
+        self.version = 0
+        # Zobrist hash of the filled cells, kept up to date by lock. A clear moves
+        # rows, which changes the key of every cell in them, so it only forgets the
+        # hash (None) and the zobrist property works it out when it is next read
+        cell_keys(width * height)
+        self.cached_zobrist = 0
+        # First and last row written by lock since the last clear_full_rows, only
+        # they can have become full
+        self.dirty_top = height
+        self.dirty_bottom = -1
+        # (version, full rows) of the last clear_full_rows that removed rows, so the
+        # renderer can move what it drew instead of drawing the moved rows again
+        self.last_clear = None
+
+    def reset(self):
+        """
+            Empties every cell of the board.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        self.rows[:] = [0] * self.height
+        self.colors[:] = bytes(self.width * self.height)
+        self.tops[:] = [self.height] * self.width
+        self.version += 1
+        self.cached_zobrist = 0
+        self.dirty_top = self.height
+        self.dirty_bottom = -1
+
+    def copy(self):
+        """
+            Makes an independent copy of the board.
+
+            Parameters:
+                None
+
+            Returns:
+                Board: The copy
+        """
+        board = Board(self.width, self.height)
+        board.rows[:] = self.rows
+        board.colors[:] = self.colors
+        board.tops[:] = self.tops
+        board.version = self.version
+        board.cached_zobrist = self.cached_zobrist
+        board.dirty_top = self.dirty_top
+        board.dirty_bottom = self.dirty_bottom
+        board.last_clear = self.last_clear
+        return board
+
+    def restore(self, rows, colors, zobrist=None):
+        """
+            Replaces every cell, for loading a saved board.
+
+            Parameters:
+                rows (list): Row bitmasks
+                colors (bytes): The color number of every cell, row by row
+                zobrist (int): The hash of rows if the caller already has it, worked
+                    out when it is first read if None
+
+            Returns:
+                None
+        """
+        self.rows[:] = rows
+        self.colors[:] = colors
+        self.update_tops()
+        self.version += 1
+        self.cached_zobrist = zobrist
+        # Rows that came in full are cleared by the next clear_full_rows too
+        self.dirty_top = min(self.tops)
+        self.dirty_bottom = self.height - 1
+
+    @property
+    def zobrist(self):
+        """The Zobrist hash of the filled cells, worked out again if a clear forgot it."""
+        if self.cached_zobrist is None:
+            self.cached_zobrist = zobrist_hash(self.rows, self.width)
+        return self.cached_zobrist
+
+    def get(self, x, y):
+        """
+            Returns the color number of a cell, 0 if it is empty.
+
+            Parameters:
+                x (int): The column
+                y (int): The row
+
+            Returns:
+                int: The color number of the cell
+        """
+        return self.colors[y * self.width + x]
+
+    def collides(self, masks, x, y):
+        """
+            Checks if a piece with the given row masks would overlap a wall, the
+            floor or a filled cell when its top left corner is at (x, y).
+
+            Parameters:
+                masks (list): The row masks of the piece
+                x (int): The column of the piece
+                y (int): The row of the piece
+
+            Returns:
+                Boolean: True if the piece collides, False if not
+        """
+        if x < 0:
+            return True
+        rows = self.rows
+        for i, mask in enumerate(masks):
+            shifted = mask << x
+            if shifted > self.full_row:
+                return True
+            row_y = y + i
+            if row_y >= self.height:
+                return True
+            if row_y >= 0 and rows[row_y] & shifted:
+                return True
+        return False
+
+    def lock(self, masks, x, y, color):
+        """
+            Writes a piece into the board. Parts of the piece above the top row are dropped.
+
+            Parameters:
+                masks (list): The row masks of the piece
+                x (int): The column of the piece
+                y (int): The row of the piece
+                color (int): The color number stored for the locked cells
+
+            Returns:
+                None
+        """
+        zobrist = self.cached_zobrist
+        for i, mask in enumerate(masks):
+            row_y = y + i
+            if row_y < 0:
+                continue
+            if row_y < self.dirty_top:
+                self.dirty_top = row_y
+            if row_y > self.dirty_bottom:
+                self.dirty_bottom = row_y
+            self.rows[row_y] |= mask << x
+            offset = row_y * self.width + x
+            j = 0
+            while mask:
+                if mask & 1:
+                    # A piece swapped in by hold can overlap the stack, those cells are already hashed
+                    if zobrist is not None and not self.colors[offset + j]:
+                        zobrist ^= CELL_KEYS[offset + j]
+                    self.colors[offset + j] = color
+                    if row_y < self.tops[x + j]:
+                        self.tops[x + j] = row_y
+                mask >>= 1
+                j += 1
+        self.cached_zobrist = zobrist
+        self.version += 1
+
+    def full_rows(self):
+        """
+            Finds every completely filled row.
+
+            Parameters:
+                None
+
+            Returns:
+                list: The indexes of the full rows, top to bottom
+        """
+        full = self.full_row
+        return [y for y, row in enumerate(self.rows) if row == full]
+
+    def clear_full_rows(self):
+        """
+            Removes the full rows and moves the rows above them down. Only the rows
+            written by lock since the last call are checked, and the rows are moved
+            in place, so the rows below the lowest full one are not touched.
+
+            Parameters:
+                None
+
+            Returns:
+                int: The number of rows removed
+        """
+        rows = self.rows
+        full_row = self.full_row
+        full = [y for y in range(self.dirty_top, self.dirty_bottom + 1) if rows[y] == full_row]
+        self.dirty_top = self.height
+        self.dirty_bottom = -1
+        if not full:
+            return 0
+        width = self.width
+        cleared = len(full)
+        colors = self.colors
+        for y in reversed(full):
+            del rows[y]
+            del colors[y * width:(y + 1) * width]
+        rows[0:0] = [0] * cleared
+        colors[0:0] = bytes(cleared * width)
+        self.cached_zobrist = None
+        self.update_tops()
+        self.version += 1
+        self.last_clear = (self.version, full)
+        return cleared
+
+    def update_tops(self):
+        """
+            Recomputes the highest filled cell of every column, going down from the
+            top row until every column has been found.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        tops = self.tops
+        tops[:] = [self.height] * self.width
+        seen = 0
+        for y, row in enumerate(self.rows):
+            found = row & ~seen
+            if not found:
+                continue
+            seen |= found
+            x = 0
+            while found:
+                if found & 1:
+                    tops[x] = y
+                found >>= 1
+                x += 1
+            if seen == self.full_row:
+                break
+
+    def landing_y(self, masks, bottoms, x, y):
+        """
+            Finds the row a piece stops at if it is dropped straight down from (x, y).
+            When the piece is above every column it covers, the answer comes straight
+            from the column tops; if it is tucked under an overhang it is stepped down.
+
+            Parameters:
+                masks (list): The row masks of the piece
+                bottoms (tuple): For each column of the piece, the offset of its lowest cell
+                x (int): The column of the piece
+                y (int): The row of the piece
+
+            Returns:
+                int: The row of the piece once it has landed
+        """
+        tops = self.tops
+        landing = self.height
+        for j, bottom in enumerate(bottoms):
+            top = tops[x + j]
+            if y + bottom >= top:
+                landing = None
+                break
+            if top - 1 - bottom < landing:
+                landing = top - 1 - bottom
+        if landing is not None:
+            return landing
+        while not self.collides(masks, x, y + 1):
+            y += 1
+        return y
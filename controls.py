@@ -0,0 +1,130 @@
+import pygame
+
+from settings import DAS, ARR, SOFT_DROP
+from engine import TICKS_PER_SECOND
+
+# Horizontal actions and the x direction they move in
+SHIFTS = {"left": -1, "right": 1}
+
+
+def to_ticks(ms):
+    """
+        Converts milliseconds to logic steps of Engine.advance.
+
+        Parameters:
+            ms (int): The time in milliseconds
+
+        Returns:
+            int: The number of logic steps, rounded
+    """
+    return round(ms * TICKS_PER_SECOND / 1000)
+
+
+class Controls:
+    def __init__(self, key_actions, das=DAS, arr=ARR, soft_drop=SOFT_DROP):
+        """
+            Turns key presses into game actions. A press acts in the frame it is read,
+            and held keys repeat on logic steps instead of the operating system's key
+            repeat, so the timing is the same on every machine and in replays.
+
+            Parameters:
+                key_actions (dict): The Engine action of each pygame key
+                das (int): Milliseconds a left or right key is held before it repeats
+                arr (int): Milliseconds between repeats, 0 to slide to the wall at once
+                soft_drop (int): Milliseconds between rows while down is held
+
+            Returns:
+                None
+        """
+        self.key_actions = key_actions
+        self.das = to_ticks(das)
+        self.arr = to_ticks(arr)
+        self.soft_drop = max(1, to_ticks(soft_drop))
+        # Left and right keys held down, the last one pressed is the one that moves
+        self.held = []
+        self.shift_ticks = 0
+        self.dropping = False
+        self.drop_ticks = 0
+        # When the oldest input that has not been shown yet was read
+        self.pending = None
+
+    def handle(self, event, now, apply):
+        """
+            Handles a key event, applying its action straight away.
+
+            Parameters:
+                event (pygame.event.Event): The event
+                now (int): perf_counter_ns when the event was read
+                apply (function): Called with each action to apply
+
+            Returns:
+                Boolean: True if the event was a game key
+        """
+        action = self.key_actions.get(getattr(event, "key", None))
+        if action is None:
+            return False
+        if event.type == pygame.KEYDOWN:
+            if self.pending is None:
+                self.pending = now
+            if action in SHIFTS:
+                if action in self.held:
+                    self.held.remove(action)
+                self.held.append(action)
+                self.shift_ticks = 0
+            elif action == "down":
+                self.dropping = True
+                self.drop_ticks = 0
+            apply(action)
+        elif event.type == pygame.KEYUP:
+            if action in self.held:
+                self.held.remove(action)
+                self.shift_ticks = 0
+            elif action == "down":
+                self.dropping = False
+        return True
+
+    def step(self, engine, apply):
+        """
+            Repeats the held keys, called once before every Engine.advance.
+
+            Parameters:
+                engine (Engine): The game
+                apply (function): Called with each action to apply
+
+            Returns:
+                None
+        """
+        if engine.paused or engine.game_over:
+            return
+        if self.held:
+            action = self.held[-1]
+            self.shift_ticks += 1
+            # is_valid returns True when the move is blocked, and a piece against
+            # the wall is left alone so blocked moves are not recorded
+            if self.shift_ticks >= self.das and not engine.current_piece.is_valid(SHIFTS[action], 0):
+                if self.arr == 0:
+                    while not engine.current_piece.is_valid(SHIFTS[action], 0):
+                        apply(action)
+                elif (self.shift_ticks - self.das) % self.arr == 0:
+                    apply(action)
+        if self.dropping:
+            self.drop_ticks += 1
+            if self.drop_ticks % self.soft_drop == 0:
+                apply("down")
+
+    def latency(self, now):
+        """
+            Returns how long the oldest unshown input waited to reach the screen,
+            called once the frame is on the display.
+
+            Parameters:
+                now (int): perf_counter_ns after the display was updated
+
+            Returns:
+                int: Nanoseconds, or None if there was no input this frame
+        """
+        if self.pending is None:
+            return None
+        waited = now - self.pending
+        self.pending = None
+        return waited
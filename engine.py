@@ -0,0 +1,274 @@
+from board import Board
+from piece import Piece
+from randomizer import Randomizer
+from tetrominoes import spawn_column
+
+# Points for clearing 1, 2, 3 or 4 lines at once, multiplied by the level
+SCORING = {1: 40, 2: 100, 3: 300, 4: 1200}
+
+# Number of pieces shown in the "Next" preview
+PREVIEW = 3
+
+# Names of the actions Engine.apply understands
+ACTIONS = ("left", "right", "down", "rotate", "rotate_ccw", "drop", "hold")
+
+# Logic steps per second of Engine.advance
+TICKS_PER_SECOND = 60
+# Logic steps a piece can rest on the stack before it locks
+LOCK_DELAY = 30
+# Lines cleared per level
+LINES_PER_LEVEL = 10
+
+
+def gravity_ticks(level):
+    """
+        Works out how many logic steps a piece takes to fall one row, starting at
+        one row a second on level 1 and speeding up with every level.
+
+        Parameters:
+            level (int): The level
+
+        Returns:
+            int: Logic steps per row, at least 1
+    """
+    seconds = (0.8 - (level - 1) * 0.007) ** (level - 1)
+    return max(1, round(TICKS_PER_SECOND * seconds))
+
+
+class Engine:
+    def __init__(self, seed=None, board=None, mode="bag"):
+        """
+            Initializes the game rules without any display, so it can run headless.
+            Every engine has its own board and randomizer, so games never share
+            state and the same seed always deals the same pieces.
+
+            Parameters:
+                seed (int): Seed for the pieces, random if None
+                board (Board): The board to play on, a new empty one if None
+                mode (str): "bag" for the 7-bag randomizer, "random" for independent draws
+
+            Returns:
+                None
+        """
+        self.randomizer = Randomizer(seed, mode)
+        self.seed = self.randomizer.seed
+        self.board = Board() if board is None else board
+        self.current_piece = self.take_piece()
+        self.hold_piece = None
+        self.hold_used = False
+        self.score = 0
+        self.level = 1
+        self.game_over = False
+        self.lines_cleared = 0
+        self.pieces_locked = 0
+        self.paused = False
+        # Logic steps run by advance, and the steps since the piece last fell or landed
+        self.ticks = 0
+        self.gravity_timer = 0
+        self.lock_timer = 0
+
+    @property
+    def next_pieces(self):
+        """The shape indexes of the pieces that come next, read from the randomizer's queue."""
+        return self.randomizer.peek(PREVIEW)
+
+    def take_piece(self):
+        """
+            Creates a piece on this engine's board from the front of the queue.
+
+            Parameters:
+                None
+
+            Returns:
+                Piece: The new piece
+        """
+        return Piece(self.randomizer.next(), self.board)
+
+    def new_piece(self):
+        """
+            Creates a new piece and checks for game over condition.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        self.current_piece = self.take_piece()
+        self.hold_used = False
+        self.gravity_timer = 0
+        self.lock_timer = 0
+        if self.board.collides(self.current_piece.masks, self.current_piece.x, self.current_piece.y):
+            self.game_over = True
+
+    def hold_current_piece(self):
+        """
+            This Function holds the current piece then it swaps it with the held piece.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        if self.hold_used:
+            return
+        if self.hold_piece is None:
+            self.hold_piece = self.current_piece
+            self.new_piece()
+        else:
+            self.current_piece, self.hold_piece = self.hold_piece, self.current_piece
+            self.current_piece.x = spawn_column(self.current_piece.state, self.board.width)
+            self.current_piece.y = 0
+            self.gravity_timer = 0
+            self.lock_timer = 0
+        self.hold_used = True
+
+    def clear_lines(self):
+        """
+            This function erases completed lines so the game can continue. Every
+            LINES_PER_LEVEL lines go up a level.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        lines_cleared_now = self.board.clear_full_rows()
+        if lines_cleared_now > 0:
+            self.score += SCORING.get(lines_cleared_now, 0) * self.level
+            self.lines_cleared += lines_cleared_now
+            self.level = 1 + self.lines_cleared // LINES_PER_LEVEL
+
+    def step(self):
+        """
+            Runs the rules that follow a move: once the current piece has locked,
+            completed lines are cleared and the next piece is spawned.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        if self.paused or self.game_over:
+            return
+        if self.current_piece.locked:
+            self.pieces_locked += 1
+            self.clear_lines()
+            self.new_piece()
+
+    def tick(self):
+        """
+            Applies one gravity tick, the same as the FALL_EVENT in main.py.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        if self.paused or self.game_over:
+            return
+        self.current_piece.move(0, 1)
+        self.step()
+
+    def advance(self):
+        """
+            Runs one fixed logic step of 1 / TICKS_PER_SECOND seconds. The piece falls
+            a row every gravity_ticks(level) steps, and once it rests on the stack it
+            locks after LOCK_DELAY steps unless it is moved off the edge first.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        self.ticks += 1
+        if self.paused or self.game_over:
+            return
+        piece = self.current_piece
+        # is_valid returns True when the move is blocked
+        if piece.is_valid(0, 1):
+            self.gravity_timer = 0
+            self.lock_timer += 1
+            if self.lock_timer >= LOCK_DELAY:
+                piece.move(0, 1)
+                self.step()
+            return
+        self.lock_timer = 0
+        self.gravity_timer += 1
+        if self.gravity_timer >= gravity_ticks(self.level):
+            self.gravity_timer = 0
+            piece.move(0, 1)
+
+    def steps_to_event(self):
+        """
+            Works out how many advance steps can run before one of them moves or locks
+            the piece, as long as no action is applied in between.
+
+            Parameters:
+                None
+
+            Returns:
+                int: The step that changes something, None if advance never will
+        """
+        if self.paused or self.game_over:
+            return None
+        if self.current_piece.is_valid(0, 1):
+            return max(1, LOCK_DELAY - self.lock_timer)
+        return max(1, gravity_ticks(self.level) - self.gravity_timer)
+
+    def skip(self, steps):
+        """
+            Runs advance steps in which nothing happens all at once. steps must be
+            less than steps_to_event, so only the counters change.
+
+            Parameters:
+                steps (int): Number of steps
+
+            Returns:
+                None
+        """
+        self.ticks += steps
+        if self.paused or self.game_over:
+            return
+        if self.current_piece.is_valid(0, 1):
+            self.gravity_timer = 0
+            self.lock_timer += steps
+        else:
+            self.lock_timer = 0
+            self.gravity_timer += steps
+
+    def apply(self, action):
+        """
+            Applies one player action, the same as the matching key in main.py.
+
+            Parameters:
+                action (str): One of ACTIONS
+
+            Returns:
+                None
+        """
+        if self.paused or self.game_over:
+            return
+        piece = self.current_piece
+        if action == "left":
+            piece.move(-1, 0)
+        elif action == "right":
+            piece.move(1, 0)
+        elif action == "down":
+            piece.move(0, 1)
+        elif action == "rotate":
+            piece.rotate()
+        elif action == "rotate_ccw":
+            piece.rotate_ccw()
+        elif action == "drop":
+            piece.instant_drop()
+        elif action == "hold":
+            self.hold_current_piece()
+        else:
+            raise ValueError(f"unknown action {action!r}")
+        self.step()
@@ -0,0 +1,95 @@
+from collections import OrderedDict
+
+import pygame
+
+from settings import FONT_NAME
+
+# Every font is loaded once, SysFont searches the system font list on each call
+FONTS = {}
+
+
+def get_font(size, bold=False, name=FONT_NAME):
+    """
+        Returns the font for a face and size, loading it the first time it is asked for.
+
+        Parameters:
+            size (int): The point size
+            bold (bool): Whether the bold face is wanted
+            name (str): The system font name
+
+        Returns:
+            pygame.font.Font: The loaded font
+    """
+    key = (name, size, bold)
+    font = FONTS.get(key)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = pygame.font.SysFont(name, size, bold=bold)
+        FONTS[key] = font
+    return font
+
+
+class TextCache:
+    def __init__(self, max_size=128):
+        """
+            Creates a cache of rendered text surfaces that drops the least recently
+            used surface once it holds max_size of them.
+
+            Parameters:
+                max_size (int): The most surfaces kept at once
+
+            Returns:
+                None
+        """
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, font_key, color, antialias):
+        """
+            Returns the rendered surface for a string, only rendering it if it is not cached.
+
+            Parameters:
+                text (str): The text to render
+                font_key (tuple): (size, bold, name) as passed to get_font
+                color: The text color, anything pygame accepts as a color
+                antialias (bool): Whether to smooth the edges
+
+            Returns:
+                pygame.Surface: The rendered text, shared so it must not be drawn on
+        """
+        key = (text, font_key, color, antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = get_font(*font_key).render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+
+text_cache = TextCache()
+
+
+def render_text(text, size, antialias, color, bold=False, name=FONT_NAME):
+    """
+        Renders text through the shared cache, in the same order of arguments as Font.render.
+
+        Parameters:
+            text (str): The text to render
+            size (int): The point size
+            antialias (bool): Whether to smooth the edges
+            color: The text color
+            bold (bool): Whether the bold face is used
+            name (str): The system font name
+
+        Returns:
+            pygame.Surface: The rendered text
+    """
+    return text_cache.render(text, (size, bold, name), color, antialias)
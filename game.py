@@ -1,77 +1,101 @@
 import pygame
-import copy
 
 import settings
-from settings import (WIDTH, HEIGHT, CELL_SIZE, GRID_WIDTH, GRID_HEIGHT,
-                      SIDE_WIDTH, WINDOW_WIDTH, WINDOW_HEIGHT, BLACK, GRAY, BLUE, grid, COLORS, BLOCK_TEXTURES)
-from piece import Piece
+from settings import (CELL_SIZE, MIN_CELL_SIZE, MAX_WINDOW_WIDTH, MAX_WINDOW_HEIGHT,
+                      SIDE_WIDTH, BLACK, GRAY, BLUE, COLORS)
+from textures import BLOCK_TEXTURES, asset_path
+from fonts import get_font, render_text
+from engine import Engine
+from leaderboard import Leaderboard
+from tetrominoes import ROTATIONS, PIECE_COLORS
 
+# Space around the side panel and between its lines, in pixels
+PANEL_MARGIN = 20
+PANEL_GAP = 10
 
-class Game:
-    def __init__(self):
+
+def fit_cell_size(width, height):
+    """
+        Picks the biggest cell size, up to CELL_SIZE, at which a board and the side
+        panel fit in the largest window.
+
+        Parameters:
+            width (int): Columns of the board
+            height (int): Rows of the board
+
+        Returns:
+            int: The width and height of a cell in pixels
+    """
+    fit = min((MAX_WINDOW_WIDTH - SIDE_WIDTH) // width, MAX_WINDOW_HEIGHT // height)
+    return max(MIN_CELL_SIZE, min(CELL_SIZE, fit))
+
+
+class Game(Engine):
+    def __init__(self, seed=None, mode="bag", board=None, leaderboard=None, cell_size=None):
         """
-            Initializes the game.
+            Initializes the game and opens the window it is drawn in. The window is
+            sized for the board, so any board size can be played.
 
             Parameters:
-                None
+                seed (int): Seed for the pieces, random if None
+                mode (str): "bag" or "random", see Randomizer
+                board (Board): The board to play on, a new empty one if None
+                leaderboard (Leaderboard): Where high scores are kept, the highscores.db next
+                    to the game if None
+                cell_size (int): Width and height of a cell in pixels, the biggest that
+                    fits the board in the largest window if None
 
             Returns:
                 None
         """
-        self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-        self.current_piece = Piece()  
-        self.next_pieces = [Piece(), Piece(), Piece()]  
-        self.hold_piece = None
-        self.hold_used = False
-        self.score = 0
-        self.level = 1
-        self.game_over = False
-        self.lines_cleared = 0
+        Engine.__init__(self, seed, board, mode)
+        # Only the first game starts pygame, the rules never need it
+        if not pygame.get_init():
+            pygame.init()
+        self.cell_size = fit_cell_size(self.board.width, self.board.height) if cell_size is None else cell_size
+        self.grid_width = self.board.width * self.cell_size
+        self.grid_height = self.board.height * self.cell_size
+        # Hold and next pieces are drawn at half the default cell size, whatever the board
+        self.preview_size = CELL_SIZE // 2
+        self.panel = self.layout_panel()
+        self.screen = pygame.display.set_mode((self.grid_width + SIDE_WIDTH,
+                                               max(self.grid_height, self.panel["bottom"])))
+        self.leaderboard = leaderboard
         self.high_scores = []
         self.new_high = False
         self.high_scores_updated = False
-        self.paused = False
+        # Locked blocks are drawn once onto this layer and only the cells that changed are redrawn
+        self.board_layer = pygame.Surface((self.grid_width, self.grid_height))
+        self.empty_row = self.make_empty_row()
+        # The part of the board layer the last draw_grid changed
+        self.grid_rect = pygame.Rect(0, 0, 0, 0)
+        self.forget_grid()
+        # Where the falling piece and its ghost were drawn, and what they looked like
+        self.piece_rects = []
+        self.piece_key = None
+        self.panel_key = None
+        self.overlay = None
+        self.redraw_all = True
 
     def load_high_scores(self):
         """
-            Loads high scores from a text file and returns them as a list of (name, score) tuples.
+            Returns the leaderboard shown at game over, opening the default store the
+            first time if the game was not given one.
 
             Parameters:
                 None
 
             Returns:
                 list: list of tuples containing player names and their corresponding scores.
-                    Returns an empty list if the file cannot be read or is improperly formatted.
-        """
-        try:
-            with open("highscores.txt", "r") as f:
-                lines = f.read().strip().splitlines()
-                scores = []
-                for line in lines:
-                    parts = line.rsplit(" ", 1) 
-                    if len(parts) == 2 and parts[1].isdigit():
-                        scores.append((parts[0], int(parts[1]))) 
-                return scores
-        except:
-            return []
-        
-    def save_high_scores(self, scores):
-        """
-            Saves the given list of high scores to a text file.
-
-            Parameters:
-                scores (list): A list of tuples containing player initials and their scores.
-
-            Returns:
-            None
         """
-        with open("highscores.txt", "w") as f:
-            for initials, score in scores:
-                f.write(f"{initials} {score}\n")
+        if self.leaderboard is None:
+            self.leaderboard = Leaderboard(asset_path("highscores.db"), legacy=asset_path("highscores.txt"))
+        return self.leaderboard.top()
 
     def update_high_scores(self, current_score):
         """
             Updates the high score list if the current score qualifies as a new high score.
+            The score is written to disk in the background, so this never waits on the disk.
 
             Parameters:
                 current_score (int): The score achieved in the current game session.
@@ -82,21 +106,12 @@ class Game:
                 - bool: Indicates whether the current score was a new high score.
         """
         old_scores = self.load_high_scores()
-        is_new_high = False
-        new_initials = None
-
-        if len(old_scores) < 3 or current_score > min(score for _, score in old_scores):
-            is_new_high = True
-            new_initials = self.get_initials_input(current_score)  
-
-        if is_new_high:
-            scores = old_scores + [(new_initials, current_score)]
-            scores = sorted(scores, key=lambda x: x[1], reverse=True)[:3]  # Keep top 3
-            self.save_high_scores(scores)
-            return scores, is_new_high
-        else:
-            return old_scores, is_new_high
-        
+        if not self.leaderboard.qualifies(current_score):
+            return old_scores, False
+        new_initials = self.get_initials_input(current_score)
+        self.leaderboard.add(new_initials, current_score)
+        return self.leaderboard.top(), True
+
     def get_initials_input(self, new_score):
         """
             Displays a prompt for the player to enter their initials after achieving a high score.
@@ -108,8 +123,8 @@ class Game:
                 str: A string of up to 3 uppercase letters entered by the player.
         """
         initials = ""  
-        font = pygame.font.SysFont("Times New Roman", 24, bold=True)
         input_active = True
+        window_width, window_height = self.screen.get_size()
 
         formatted_score = f"{new_score:06d}"
 
@@ -117,17 +132,17 @@ class Game:
             self.screen.fill(BLACK)
             
             box_width, box_height = 300, 200  
-            box_x = (WINDOW_WIDTH - box_width) // 2  
-            box_y = (WINDOW_HEIGHT - box_height) // 2  
+            box_x = (window_width - box_width) // 2  
+            box_y = (window_height - box_height) // 2  
             pygame.draw.rect(self.screen, "black", (box_x, box_y, box_width, box_height))
             pygame.draw.rect(self.screen, "white", (box_x, box_y, box_width, box_height), 2)
 
-            new_high_text = font.render("NEW HIGH SCORE!", True, "red")
-            score_text = font.render(formatted_score, True, "#00bfff")  # Cyan for formatted score
-            prompt_text = font.render("Enter Your Initials", True, "white")
+            new_high_text = render_text("NEW HIGH SCORE!", 24, True, "red", bold=True)
+            score_text = render_text(formatted_score, 24, True, "#00bfff", bold=True)  # Cyan for formatted score
+            prompt_text = render_text("Enter Your Initials", 24, True, "white", bold=True)
             initials_display = initials if initials else "_ _ _"  
-            initials_text = font.render(initials_display, True, "#ffd700")  # Gold for initials
-            confirm_text = font.render("Press Enter to Confirm", True, "gray")
+            initials_text = render_text(initials_display, 24, True, "#ffd700", bold=True)  # Gold for initials
+            confirm_text = render_text("Press Enter to Confirm", 24, True, "gray", bold=True)
 
             self.screen.blit(new_high_text, (box_x + (box_width - new_high_text.get_width()) // 2, box_y + 20))
             self.screen.blit(score_text, (box_x + (box_width - score_text.get_width()) // 2, box_y + 60))
@@ -163,30 +178,58 @@ class Game:
         """
         return f"{score:06d}"
 
-    def new_piece(self):
+    def layout_panel(self):
         """
-            Creates a new piece and checks for game over condition.
+            Works out where everything in the side panel goes, from the top down. Each
+            line of text takes the height of its font and the previews the size of
+            their cells, so the panel fits whatever font is found.
 
             Parameters:
                 None
 
             Returns:
+                dict: The y of every item in the panel, "next_step" between the next
+                    pieces and "bottom" below the last one
+        """
+        large = get_font(30).get_linesize() + PANEL_GAP
+        small = get_font(20).get_linesize() + PANEL_GAP
+        preview = self.preview_size
+        panel = {"title": PANEL_MARGIN}
+        panel["score"] = panel["title"] + large
+        panel["level"] = panel["score"] + large
+        panel["lines"] = panel["level"] + large
+        panel["hold"] = panel["lines"] + large
+        panel["hold_piece"] = panel["hold"] + small
+        # A held I piece can be standing up, four cells tall
+        panel["next"] = panel["hold_piece"] + 4 * preview + PANEL_GAP
+        panel["next_pieces"] = panel["next"] + small
+        # Next pieces are in their spawn rotation, at most two cells tall
+        panel["next_step"] = 2 * preview + 2 * PANEL_GAP
+        panel["bottom"] = panel["next_pieces"] + len(self.next_pieces) * panel["next_step"] + PANEL_MARGIN
+        return panel
+
+    def make_empty_row(self):
+        """
+            Draws one row of empty cells, which is blitted wherever the board is empty.
+
+            Parameters:
                 None
+
+            Returns:
+                pygame.Surface: The row, as wide as the board
         """
-        self.current_piece = Piece()
-        self.hold_used = False
-        for i, row in enumerate(self.current_piece.shape):
-            for j, cell in enumerate(row):
-                if cell:
-                    if grid[self.current_piece.y + i][self.current_piece.x + j] != 0:
-                        self.game_over = True
-                        break
-            if self.game_over:
-                break
+        size = self.cell_size
+        row = pygame.Surface((self.grid_width, size))
+        empty = BLOCK_TEXTURES.at(size)[0]
+        for x in range(self.board.width):
+            row.blit(empty, (x * size, 0))
+            pygame.draw.rect(row, GRAY, (x * size, 0, size, size), 1)
+        return row
 
-    def hold_current_piece(self):
+    def forget_grid(self):
         """
-            This Function holds the current piece then it swaps it with the held piece.
+            Marks every cell of the board layer as out of date, so the next draw_grid
+            draws them all.
 
             Parameters:
                 None
@@ -194,75 +237,117 @@ class Game:
             Returns:
                 None
         """
-        if self.hold_used:
-            return
-        if self.hold_piece is None:
-            self.hold_piece = self.current_piece
-            self.new_piece()
-        else:
-            self.current_piece, self.hold_piece = self.hold_piece, self.current_piece
-            self.current_piece.x = WIDTH // 2 - len(self.current_piece.shape[0]) // 2
-            self.current_piece.y = 0
-        self.hold_used = True
+        # The color of every cell as it is drawn on the board layer, 255 for not drawn
+        self.drawn = bytearray(b"\xff") * (self.board.width * self.board.height)
+        # No row above this one is drawn with filled cells
+        self.drawn_top = 0
+        self.board_version = None
 
-    def clear_lines(self):
+    def scroll_cleared(self, full):
         """
-            This function erases completed lines so the game can continue
+            Moves what is drawn above each cleared row down one row, the way
+            Board.clear_full_rows moved the rows, so those rows are not drawn again.
 
             Parameters:
-                None
+                full (list): The cleared rows, top to bottom
 
             Returns:
-                None
-        """
-        lines_cleared_now = 0
-        new_grid = []
-        for row in grid:
-            if 0 not in row:
-                lines_cleared_now += 1
-            else:
-                new_grid.append(row)
-        for _ in range(lines_cleared_now):
-            new_grid.insert(0, [0 for _ in range(WIDTH)])
-        for i in range(HEIGHT):
-            grid[i] = new_grid[i]
-        if lines_cleared_now > 0:
-            scoring = {1: 40, 2: 100, 3: 300, 4: 1200}
-            self.score += scoring.get(lines_cleared_now, 0) * self.level
-            self.lines_cleared += lines_cleared_now
+                int: The lowest row moved, -1 if nothing was
+        """
+        width = self.board.width
+        size = self.cell_size
+        drawn = self.drawn
+        lowest = -1
+        for y in full:
+            top = self.drawn_top
+            if y < top:
+                # Only empty rows are drawn above it
+                continue
+            self.board_layer.set_clip((0, top * size, self.grid_width, (y + 1 - top) * size))
+            self.board_layer.scroll(0, size)
+            self.board_layer.set_clip(None)
+            self.board_layer.blit(self.empty_row, (0, top * size))
+            del drawn[y * width:(y + 1) * width]
+            drawn[0:0] = bytes(width)
+            self.drawn_top = top + 1
+            lowest = y
+        return lowest
 
     def draw_grid(self):
         """
-            This function draws the game grid onto the screen
+            This function draws the game grid onto the board layer. Only the cells
+            that differ from what was last drawn are drawn, going down from the top of
+            the stack, and rows moved down by a line clear are scrolled, so the cost
+            follows what changed rather than the size of the board.
 
             Parameters:
                 None
 
             Returns:
-                None
-        """
-        for y in range(HEIGHT):
-            for x in range(WIDTH):
-                # If grid is empty
-                if grid[y][x] == 0:
-                    self.screen.blit(BLOCK_TEXTURES[str(grid[y][x])],
-                                 (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-
-                    pygame.draw.rect(self.screen, GRAY,
-                                     (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE), 1)
-                # If grid is filled by a piece
-                else:
-                    self.screen.blit((grid[y][x]),
-                                 (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+                Boolean: True if the board layer was redrawn
+        """
+        board = self.board
+        if board.version == self.board_version:
+            return False
+        # Rows above both the stack and what is drawn are empty in both
+        top = min(min(board.tops), self.drawn_top)
+        # First and last row of the layer that change
+        first = board.height
+        last = -1
+        if (board.last_clear is not None and self.board_version is not None
+                and board.last_clear[0] > self.board_version):
+            scroll_top = self.drawn_top
+            last = self.scroll_cleared(board.last_clear[1])
+            if last >= 0:
+                first = scroll_top
+        width = board.width
+        size = self.cell_size
+        textures = BLOCK_TEXTURES.at(size)
+        colors = board.colors
+        drawn = self.drawn
+        layer = self.board_layer
+        for y in range(top, board.height):
+            start = y * width
+            row = colors[start:start + width]
+            if row == drawn[start:start + width]:
+                continue
+            first = min(first, y)
+            last = max(last, y)
+            if row.count(0) == width:
+                layer.blit(self.empty_row, (0, y * size))
+            else:
+                for x in range(width):
+                    color = row[x]
+                    if color != drawn[start + x]:
+                        if color:
+                            layer.blit(textures[color], (x * size, y * size))
+                        else:
+                            layer.blit(self.empty_row, (x * size, y * size), (x * size, 0, size, size))
+            drawn[start:start + width] = row
+        self.drawn_top = min(board.tops)
+        self.board_version = board.version
+        self.grid_rect = pygame.Rect(0, first * size, self.grid_width, max(0, last + 1 - first) * size)
+        return True
+
+    def piece_rect(self, piece, y):
+        """
+            Finds the area of the board covered by a piece's bounding box.
 
-                # Adds gray lines to placed pieces
-                #pygame.draw.rect(self.screen, GRAY,
-                #                 (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE), 1)
+            Parameters:
+                piece (Piece): The piece to measure
+                y (int): The row the piece is drawn at
 
+            Returns:
+                pygame.Rect: The covered area, clipped to the board
+        """
+        state = piece.state
+        size = self.cell_size
+        rect = pygame.Rect(piece.x * size, y * size, state.width * size, state.height * size)
+        return rect.clip(self.board_layer.get_rect())
 
     def draw_piece(self):
         """
-            Draws the current piece on the screen.
+            Draws the current piece on the screen and remembers the area it covers.
 
             Parameters:
                 None
@@ -270,18 +355,19 @@ class Game:
             Returns:
                 None
         """
-        for i, row in enumerate(self.current_piece.shape):
-            for j, cell in enumerate(row):
-                if cell:
-                    self.screen.blit(BLOCK_TEXTURES[str(self.current_piece.color)],
-                                     ((self.current_piece.x + j) * CELL_SIZE,
-                                      (self.current_piece.y + i) * CELL_SIZE))
+        self.piece_rects.append(self.piece_rect(self.current_piece, self.current_piece.y))
+        size = self.cell_size
+        texture = BLOCK_TEXTURES.at(size)[self.current_piece.color]
+        for j, i in self.current_piece.cells:
+            self.screen.blit(texture,
+                             ((self.current_piece.x + j) * size,
+                              (self.current_piece.y + i) * size))
 
-                    # Uncomment to add gray lines to falling pieces
-                    #pygame.draw.rect(self.screen, GRAY,
-                    #                 ((self.current_piece.x + j) * CELL_SIZE,
-                    #                  (self.current_piece.y + i) * CELL_SIZE,
-                    #                  CELL_SIZE, CELL_SIZE), 1)
+            # Uncomment to add gray lines to falling pieces
+            #pygame.draw.rect(self.screen, GRAY,
+            #                 ((self.current_piece.x + j) * size,
+            #                  (self.current_piece.y + i) * size,
+            #                  size, size), 1)
 
 
     def draw_ghost_piece(self):
@@ -294,28 +380,27 @@ class Game:
             Returns:
                 None
         """
-        ghost_piece = copy.deepcopy(self.current_piece)
-        while not ghost_piece.is_valid(0, 1):
-            ghost_piece.y += 1
+        ghost_y = self.current_piece.landing_y()
+        self.piece_rects.append(self.piece_rect(self.current_piece, ghost_y))
         current_color = COLORS[self.current_piece.color]
         ghost_color = tuple(min(255, int(c + (255 - c) * 0.5)) for c in current_color)
         dark_ghost_color = tuple(max(0, int(c * 0.75)) for c in ghost_color)
-        for i, row in enumerate(ghost_piece.shape):
-            for j, cell in enumerate(row):
-                if cell:
-                    grid_y = ghost_piece.y + i
-                    grid_x = ghost_piece.x + j
-                    x_pos = grid_x * CELL_SIZE
-                    y_pos = grid_y * CELL_SIZE
-                    if 0 <= grid_y < HEIGHT and 0 <= grid_x < WIDTH and grid[grid_y][grid_x] == 0:
-                        #Makes ghost outline
-                        #pygame.draw.rect(self.screen, dark_ghost_color,
-                        #                 (x_pos, y_pos, CELL_SIZE, CELL_SIZE))
-                        pygame.draw.rect(self.screen, ghost_color,
-                                         (x_pos, y_pos, CELL_SIZE, CELL_SIZE), 2)
-                    else:
-                        pygame.draw.rect(self.screen, ghost_color,
-                                         (x_pos, y_pos, CELL_SIZE, CELL_SIZE), 1)
+        size = self.cell_size
+        for j, i in self.current_piece.cells:
+            grid_y = ghost_y + i
+            grid_x = self.current_piece.x + j
+            x_pos = grid_x * size
+            y_pos = grid_y * size
+            if (0 <= grid_y < self.board.height and 0 <= grid_x < self.board.width
+                    and self.board.get(grid_x, grid_y) == 0):
+                #Makes ghost outline
+                #pygame.draw.rect(self.screen, dark_ghost_color,
+                #                 (x_pos, y_pos, size, size))
+                pygame.draw.rect(self.screen, ghost_color,
+                                 (x_pos, y_pos, size, size), 2)
+            else:
+                pygame.draw.rect(self.screen, ghost_color,
+                                 (x_pos, y_pos, size, size), 1)
 
     def side_panel(self):
         """
@@ -327,51 +412,59 @@ class Game:
             Returns:
                 None
         """
-        pygame.draw.rect(self.screen, BLUE, (GRID_WIDTH, 0, SIDE_WIDTH, WINDOW_HEIGHT))
-        font = pygame.font.SysFont('Times New Roman', 30)
-        title_text = font.render('Tetris', False, BLACK)
-        self.screen.blit(title_text, (GRID_WIDTH + 20, 20))
+        panel = self.panel
+        left = self.grid_width + PANEL_MARGIN
+        pygame.draw.rect(self.screen, BLUE, self.panel_rect())
+        title_text = render_text('Tetris', 30, False, BLACK)
+        self.screen.blit(title_text, (left, panel["title"]))
         # Render score and level text
         score_str = f"Score: {self.score:06d}"
         level_str = f"Level: {self.level}"
         lines_str = f"Lines: {self.lines_cleared}"
-        score_text = font.render(score_str, False, BLACK)
-        level_text = font.render(level_str, False, BLACK)
-        lines_text = font.render(lines_str, False, BLACK)
-        self.screen.blit(score_text, (GRID_WIDTH + 20, 60))
-        self.screen.blit(level_text, (GRID_WIDTH + 20, 100))
-        self.screen.blit(lines_text, (GRID_WIDTH + 20, 140))
+        score_text = render_text(score_str, 30, False, BLACK)
+        level_text = render_text(level_str, 30, False, BLACK)
+        lines_text = render_text(lines_str, 30, False, BLACK)
+        self.screen.blit(score_text, (left, panel["score"]))
+        self.screen.blit(level_text, (left, panel["level"]))
+        self.screen.blit(lines_text, (left, panel["lines"]))
         margin = 5  
-        max_width = max(font.size(score_str)[0], font.size(level_str)[0], font.size(lines_str)[0])
-        text_height = font.get_height()
-        border_x = GRID_WIDTH + 20 - margin
-        border_y = 60 - margin
+        max_width = max(score_text.get_width(), level_text.get_width(), lines_text.get_width())
+        text_height = get_font(30).get_height()
+        border_x = left - margin
+        border_y = panel["score"] - margin
         border_width = max_width + 2 * margin
-        border_height = (140 + text_height - 60) + 2 * margin
+        border_height = (panel["lines"] + text_height - panel["score"]) + 2 * margin
         pygame.draw.rect(self.screen, BLACK, (border_x, border_y, border_width, border_height), 2)
-        preview_font = pygame.font.SysFont('Times New Roman', 20)
-        hold_text = preview_font.render('Hold:', False, BLACK)
-        self.screen.blit(hold_text, (GRID_WIDTH + 20, 180))
+        hold_text = render_text('Hold:', 20, False, BLACK)
+        self.screen.blit(hold_text, (left, panel["hold"]))
+        # Hold and next pieces are drawn at half size
+        size = self.preview_size
+        previews = BLOCK_TEXTURES.at(size)
         if self.hold_piece is not None:
-            for i, row in enumerate(self.hold_piece.shape):
-                for j, cell in enumerate(row):
-                    if cell:
-                        rect = pygame.Rect(GRID_WIDTH + 20 + j * (CELL_SIZE // 2),
-                                           210 + i * (CELL_SIZE // 2),
-                                           CELL_SIZE // 2, CELL_SIZE // 2)
-                        pygame.draw.rect(self.screen, COLORS[self.hold_piece.color], rect)
-                        pygame.draw.rect(self.screen, GRAY, rect, 1)
-        next_text = preview_font.render('Next:', False, BLACK)
-        self.screen.blit(next_text, (GRID_WIDTH + 20, 280))
-        for index, piece in enumerate(self.next_pieces):
-            for i, row in enumerate(piece.shape):
-                for j, cell in enumerate(row):
-                    if cell:
-                        rect = pygame.Rect(GRID_WIDTH + 20 + j * (CELL_SIZE // 2),
-                                           320 + index * 80 + i * (CELL_SIZE // 2),
-                                           CELL_SIZE // 2, CELL_SIZE // 2)
-                        pygame.draw.rect(self.screen, COLORS[piece.color], rect)
-                        pygame.draw.rect(self.screen, GRAY, rect, 1)
+            for j, i in self.hold_piece.cells:
+                rect = pygame.Rect(left + j * size, panel["hold_piece"] + i * size, size, size)
+                self.screen.blit(previews[self.hold_piece.color], rect)
+                pygame.draw.rect(self.screen, GRAY, rect, 1)
+        next_text = render_text('Next:', 20, False, BLACK)
+        self.screen.blit(next_text, (left, panel["next"]))
+        for index, shape_index in enumerate(self.next_pieces):
+            top = panel["next_pieces"] + index * panel["next_step"]
+            for j, i in ROTATIONS[shape_index][0].cells:
+                rect = pygame.Rect(left + j * size, top + i * size, size, size)
+                self.screen.blit(previews[PIECE_COLORS[shape_index]], rect)
+                pygame.draw.rect(self.screen, GRAY, rect, 1)
+
+    def panel_rect(self):
+        """
+            Finds the area of the window the side panel covers.
+
+            Parameters:
+                None
+
+            Returns:
+                pygame.Rect: The panel, right of the board and as tall as the window
+        """
+        return pygame.Rect(self.grid_width, 0, SIDE_WIDTH, self.screen.get_height())
 
     def display_pause(self):
         """
@@ -383,9 +476,8 @@ class Game:
             Returns:
                 None
         """
-        font = pygame.font.SysFont('Times New Roman', 30)
-        text = font.render("Paused - Press P to resume", True, BLACK)
-        text_rect = text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2))
+        text = render_text("Paused - Press P to resume", 30, True, BLACK)
+        text_rect = text.get_rect(center=self.screen.get_rect().center)
         padding = 10
         bg_rect = pygame.Rect(text_rect.left - padding,
                               text_rect.top - padding,
@@ -405,7 +497,6 @@ class Game:
             Returns:
                 None
         """
-        font = pygame.font.SysFont("Times New Roman", 30, bold=True)
         lines = [("Game Over", "red")]
         if self.new_high:
             lines.append(("Congrats, New High Score!", "#ffd700"))  # Gold
@@ -415,7 +506,7 @@ class Game:
             lines.append((f"{initials} {score:06d}", "#00bfff"))  # Cyan
         lines.append(("Press R to restart", "white"))
 
-        rendered_lines = [(font.render(text, True, color), color) for text, color in lines]
+        rendered_lines = [(render_text(text, 30, True, color, bold=True), color) for text, color in lines]
 
         spacing = 10
         total_height = sum(surf.get_height() for surf, _ in rendered_lines) + spacing * (len(rendered_lines) - 1)
@@ -423,8 +514,8 @@ class Game:
         max_width = max(surf.get_width() for surf, _ in rendered_lines)
         container_width = max_width + 2 * padding
         container_height = total_height + 2 * padding
-        container_x = (WINDOW_WIDTH - container_width) // 2
-        container_y = (WINDOW_HEIGHT - container_height) // 2
+        container_x = (self.screen.get_width() - container_width) // 2
+        container_y = (self.screen.get_height() - container_height) // 2
         container_rect = pygame.Rect(container_x, container_y, container_width, container_height)
 
         pygame.draw.rect(self.screen, "#1a1a1a", container_rect)
@@ -438,29 +529,64 @@ class Game:
 
     def update(self):
         """
-            This function is called to update the display.
+            This function is called to update the display. Only the parts of the window
+            that changed are redrawn.
 
             Parameters:
                 None
 
             Returns:
-                None
-        """
-        self.screen.fill(BLACK)
-        self.draw_grid()
-        self.draw_ghost_piece()
-        self.draw_piece()
-        self.side_panel()
+                list: The rects of the window that changed, for pygame.display.update
+        """
+        overlay = "paused" if self.paused else "game over" if self.game_over else None
+        if overlay != self.overlay:
+            self.overlay = overlay
+            self.redraw_all = True
+        if self.game_over and not self.high_scores_updated:
+            self.high_scores, self.new_high = self.update_high_scores(self.score)
+            self.high_scores_updated = True
+
+        dirty_rects = []
+        if self.redraw_all:
+            self.screen.fill(BLACK)
+            dirty_rects.append(self.screen.get_rect())
+        elif overlay is not None:
+            # Nothing changes under the pause and game over boxes
+            return dirty_rects
+
+        if self.draw_grid() or self.redraw_all:
+            rect = self.board_layer.get_rect() if self.redraw_all else self.grid_rect
+            self.screen.blit(self.board_layer, rect, rect)
+            dirty_rects.append(rect)
+            # The piece is drawn again even where the board under it did not change
+            self.piece_key = None
+
+        piece = self.current_piece
+        piece_key = (piece.index, piece.rotation, piece.x, piece.y)
+        if piece_key != self.piece_key:
+            # Puts the board back where the piece and its ghost used to be
+            for rect in self.piece_rects:
+                self.screen.blit(self.board_layer, rect, rect)
+                dirty_rects.append(rect)
+            self.piece_rects = []
+            self.draw_ghost_piece()
+            self.draw_piece()
+            dirty_rects.extend(self.piece_rects)
+            self.piece_key = piece_key
+
+        hold = None if self.hold_piece is None else (self.hold_piece.index, self.hold_piece.rotation)
+        panel_key = (self.score, self.level, self.lines_cleared, hold,
+                     tuple(self.next_pieces))
+        if panel_key != self.panel_key or self.redraw_all:
+            self.side_panel()
+            dirty_rects.append(self.panel_rect())
+            self.panel_key = panel_key
+
         if self.paused:
             self.display_pause()
         elif self.game_over:
-            if not self.high_scores_updated:
-                self.high_scores, self.new_high = self.update_high_scores(self.score)
-                self.high_scores_updated = True
             self.display_game_over()
-        elif self.current_piece.locked:
-            self.clear_lines()
-            self.new_piece()
-
-
-
+        else:
+            self.step()
+        self.redraw_all = False
+        return dirty_rects
@@ -0,0 +1,213 @@
+import heapq
+import queue
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict, namedtuple
+from datetime import date
+
+# One high score. Entries with the same score are ranked by who got it first (lower id).
+Entry = namedtuple("Entry", "id initials score day")
+
+
+class Leaderboard:
+    def __init__(self, path="highscores.db", size=3, legacy=None):
+        """
+            Opens the high score store. Every entry is loaded into memory once, so
+            checking and ranking a score never touches the disk, and new entries are
+            written to SQLite by a background thread.
+
+            Parameters:
+                path (str): The SQLite file, ":memory:" to keep nothing
+                size (int): How many scores make the leaderboard shown in the game
+                legacy (str): A highscores.txt file imported when the store is new
+
+            Returns:
+                None
+        """
+        self.size = size
+        self.entries = []
+        # Every score in ascending order, for ranks
+        self.scores = []
+        # Min-heap of the best size entries as (score, -id, entry)
+        self.top_heap = []
+        self.by_player = defaultdict(list)
+        self.by_day = defaultdict(list)
+        self.next_id = 1
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS scores ("
+                                "id INTEGER PRIMARY KEY, initials TEXT NOT NULL, "
+                                "score INTEGER NOT NULL, day TEXT NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC)")
+        self.connection.commit()
+        for row in self.connection.execute("SELECT id, initials, score, day FROM scores ORDER BY id"):
+            self.index(Entry(*row))
+        self.next_id = self.entries[-1].id + 1 if self.entries else 1
+
+        self.writes = queue.Queue()
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+        if legacy and not self.entries:
+            self.import_text(legacy)
+
+    def index(self, entry):
+        """
+            Adds an entry to the in memory indexes.
+
+            Parameters:
+                entry (Entry): The entry
+
+            Returns:
+                None
+        """
+        self.entries.append(entry)
+        insort(self.scores, entry.score)
+        self.by_player[entry.initials].append(entry)
+        self.by_day[entry.day].append(entry)
+        item = (entry.score, -entry.id, entry)
+        if len(self.top_heap) < self.size:
+            heapq.heappush(self.top_heap, item)
+        elif item > self.top_heap[0]:
+            heapq.heapreplace(self.top_heap, item)
+
+    def qualifies(self, score):
+        """
+            Checks if a score would make the leaderboard shown in the game.
+
+            Parameters:
+                score (int): The score
+
+            Returns:
+                Boolean: True if it would
+        """
+        return len(self.top_heap) < self.size or score > self.top_heap[0][0]
+
+    def rank(self, score):
+        """
+            Works out where a score would be placed among every score.
+
+            Parameters:
+                score (int): The score
+
+            Returns:
+                int: 1 for the best score
+        """
+        return len(self.scores) - bisect_right(self.scores, score) + 1
+
+    def add(self, initials, score, day=None):
+        """
+            Adds a score. It is indexed straight away and written to disk in the background.
+
+            Parameters:
+                initials (str): The player's initials
+                score (int): The score
+                day (str): ISO date of the game, today if None
+
+            Returns:
+                int: The rank of the score, 1 for the best
+        """
+        entry = Entry(self.next_id, initials, score, day or date.today().isoformat())
+        self.next_id += 1
+        self.index(entry)
+        self.writes.put(entry)
+        # Every other entry with the same score came first, so ranks above this one
+        return len(self.scores) - bisect_left(self.scores, score)
+
+    def top(self, limit=None, player=None, day=None):
+        """
+            Lists the best scores, optionally of one player or one day.
+
+            Parameters:
+                limit (int): Number of scores, the leaderboard size if None
+                player (str): Only this player's scores
+                day (str): Only scores of this ISO date
+
+            Returns:
+                list: (initials, score) tuples, best first
+        """
+        limit = self.size if limit is None else limit
+        if player is None and day is None and limit <= self.size:
+            best = sorted(self.top_heap, reverse=True)[:limit]
+            return [(entry.initials, entry.score) for _, _, entry in best]
+        entries = self.entries
+        if player is not None:
+            entries = self.by_player.get(player, [])
+        if day is not None:
+            entries = [entry for entry in entries if entry.day == day] if player is not None \
+                else self.by_day.get(day, [])
+        best = heapq.nlargest(limit, entries, key=lambda entry: (entry.score, -entry.id))
+        return [(entry.initials, entry.score) for entry in best]
+
+    def import_text(self, path):
+        """
+            Imports a highscores.txt file of "initials score" lines.
+
+            Parameters:
+                path (str): The file
+
+            Returns:
+                tuple: (entries imported, lines that could not be read)
+        """
+        imported = skipped = 0
+        try:
+            with open(path) as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return imported, skipped
+        for line in lines:
+            parts = line.rsplit(" ", 1)
+            if len(parts) == 2 and parts[0] and parts[1].isdigit():
+                self.add(parts[0], int(parts[1]))
+                imported += 1
+            elif line.strip():
+                skipped += 1
+        return imported, skipped
+
+    def write_loop(self):
+        """
+            Runs on the writer thread, writing queued entries until close is called.
+            Entries queued together are committed together.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        while True:
+            entry = self.writes.get()
+            if entry is None:
+                self.writes.task_done()
+                return
+            self.connection.execute("INSERT INTO scores (id, initials, score, day) VALUES (?, ?, ?, ?)", entry)
+            if self.writes.empty():
+                self.connection.commit()
+            self.writes.task_done()
+
+    def flush(self):
+        """
+            Waits until every added entry is on disk.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        self.writes.join()
+
+    def close(self):
+        """
+            Writes what is left and closes the store.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        self.writes.put(None)
+        self.writer.join()
+        self.connection.commit()
+        self.connection.close()
@@ -1,59 +1,155 @@
+import argparse
+from time import perf_counter_ns
+
 import pygame
 from game import Game
-from settings import BLACK, grid, WIDTH, HEIGHT
+from board import Board
+from replay import Recorder
+from profiler import Profiler
+from leaderboard import Leaderboard
+from scheduler import FixedTimestep
+from controls import Controls
+from settings import BLACK, DAS, ARR, WIDTH, HEIGHT
+from textures import BLOCK_TEXTURES, asset_path
+from snapshot import RewindBuffer
+
+# Frames drawn per second, the game logic runs at its own fixed rate
+FPS = 60
 
-FALL_EVENT = pygame.USEREVENT + 1
+# Which Engine action each key triggers
+KEY_ACTIONS = {
+    pygame.K_LEFT: "left",
+    pygame.K_RIGHT: "right",
+    pygame.K_DOWN: "down",
+    pygame.K_UP: "rotate",
+    pygame.K_z: "rotate",
+    pygame.K_x: "rotate_ccw",
+    pygame.K_SPACE: "drop",
+    pygame.K_c: "hold",
+}
 
-def main():
+def main(record_path=None, profile=False, profile_csv=None, das=DAS, arr=ARR, first_frame_only=False,
+         width=WIDTH, height=HEIGHT, cell_size=None):
     #Initializes variables
     running = True
     clock = pygame.time.Clock()
-    drop_speed = 1000
+    timestep = FixedTimestep()
+    # Held keys repeat on logic steps, so the operating system's key repeat stays off
+    controls = Controls(KEY_ACTIONS, das, arr)
+
+    # High scores are kept across restarts and written in the background, next to the
+    # game like its other files so the working directory does not matter
+    leaderboard = Leaderboard(asset_path("highscores.db"), legacy=asset_path("highscores.txt"))
+
+    def new_game():
+        return Game(board=Board(width, height), leaderboard=leaderboard, cell_size=cell_size)
 
-    pygame.time.set_timer(FALL_EVENT, drop_speed)
-    pygame.key.set_repeat(200, 50)
+    game_instance = new_game()
+    # Writes every input to a file that replay.py can play back
+    recorder = Recorder(record_path) if record_path else None
+    if recorder:
+        recorder.start(game_instance, logic=True)
+    # F3 turns the stage timings and their overlay on and off
+    profiler = Profiler(enabled=profile)
+    profiler.attach(game_instance)
+    # A snapshot is taken every time a piece locks, Backspace goes back one piece
+    rewind = RewindBuffer()
+    rewind.push(game_instance)
+    pieces_locked = game_instance.pieces_locked
 
-    game_instance = Game()
+    def apply(action):
+        if game_instance.game_over or game_instance.paused:
+            return
+        if recorder:
+            recorder.record(game_instance.ticks, action)
+        game_instance.apply(action)
 
     # Starts gameplay loop
     while running:
-        game_instance.update()
-
-        #Handles all events
+        #Handles all events, as soon as the frame starts
+        events_start = perf_counter_ns()
         for event in pygame.event.get():
+            if controls.handle(event, events_start, apply):
+                continue
             if event.type == pygame.QUIT:
                 running = False
-            elif event.type == FALL_EVENT and not game_instance.game_over:
-                game_instance.current_piece.move(0, 1)
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_r:
-                    for i in range(HEIGHT):
-                        grid[i] = [0] * WIDTH
-                    game_instance = Game()
+                    if recorder:
+                        recorder.finish(game_instance)
+                    game_instance = new_game()
+                    profiler.attach(game_instance)
+                    rewind.clear()
+                    rewind.push(game_instance)
+                    pieces_locked = game_instance.pieces_locked
+                    if recorder:
+                        recorder.start(game_instance, logic=True)
+                elif event.key == pygame.K_BACKSPACE:
+                    # Recordings cannot replay a rewind, and a finished game keeps its score
+                    if not recorder and not game_instance.game_over:
+                        rewind.rewind(game_instance)
+                elif event.key == pygame.K_F3:
+                    profiler.toggle()
+                    # Uncovers what the overlay was drawn over
+                    game_instance.redraw_all = True
                 elif event.key == pygame.K_p:
                     game_instance.paused = not game_instance.paused  
-                elif not game_instance.game_over and not game_instance.paused:
-                    if event.key == pygame.K_LEFT:
-                        game_instance.current_piece.move(-1, 0)
-                    elif event.key == pygame.K_RIGHT:
-                        game_instance.current_piece.move(1, 0)
-                    elif event.key == pygame.K_DOWN:
-                        game_instance.current_piece.move(0, 1)
-                    elif event.key == pygame.K_UP or event.key == pygame.K_z:
-                        game_instance.current_piece.rotate()
-                    elif event.key == pygame.K_x:
-                        game_instance.current_piece.rotate_ccw()
-                    elif event.key == pygame.K_SPACE:
-                        game_instance.current_piece.instant_drop()
-                    elif event.key == pygame.K_c:
-                        game_instance.hold_current_piece()
-
-        # Updates the display after iteration
-        pygame.display.flip()
-        clock.tick(60)
+                    if recorder:
+                        recorder.record(game_instance.ticks, "pause")
+
+        profiler.record("events", perf_counter_ns() - events_start)
+
+        # Runs every logic step that is due, so a slow frame never slows the game down
+        for _ in range(timestep.due()):
+            controls.step(game_instance, apply)
+            game_instance.advance()
+        if game_instance.pieces_locked != pieces_locked:
+            rewind.push(game_instance)
+            pieces_locked = game_instance.pieces_locked
+        dirty_rects = game_instance.update()
+
+        if profiler.enabled:
+            dirty_rects.append(profiler.draw(game_instance.screen, clock.get_fps(), FPS))
+        # Updates the parts of the display that changed this iteration
+        display_start = perf_counter_ns()
+        pygame.display.update(dirty_rects)
+        display_end = perf_counter_ns()
+        profiler.record("display", display_end - display_start)
+        latency = controls.latency(display_end)
+        if latency is not None:
+            profiler.record("input_latency", latency)
+        profiler.end_frame()
+        if first_frame_only:
+            # startup.py times how long it takes to get here
+            print("first frame", flush=True)
+            running = False
+        clock.tick(FPS)
 
     #Ends the game
+    if recorder:
+        recorder.finish(game_instance)
+        recorder.close()
+    if profile_csv:
+        profiler.write_csv(profile_csv)
+    leaderboard.close()
     pygame.quit()
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description="Play Tetris.")
+    parser.add_argument("--record", help="write every input to this file for replay.py")
+    parser.add_argument("--profile", action="store_true", help="start with the frame profiler on (F3 toggles it)")
+    parser.add_argument("--profile-csv", help="write the profiled frames to this CSV file on exit")
+    parser.add_argument("--das", type=int, default=DAS, help="milliseconds before a held key repeats")
+    parser.add_argument("--arr", type=int, default=ARR, help="milliseconds between repeats, 0 to slide to the wall")
+    parser.add_argument("--texture-cache", help="keep the scaled block textures in this folder between runs")
+    parser.add_argument("--first-frame", action="store_true", help="quit after drawing the first frame")
+    parser.add_argument("--width", type=int, default=WIDTH, help="columns of the board")
+    parser.add_argument("--height", type=int, default=HEIGHT, help="rows of the board")
+    parser.add_argument("--cell-size", type=int, help="pixels per cell, by default the biggest that fits the screen")
+    args = parser.parse_args()
+    for name in ("width", "height"):
+        if getattr(args, name) < 4:
+            parser.error(f"--{name} must be at least 4")
+    BLOCK_TEXTURES.cache_dir = args.texture_cache
+    main(args.record, args.profile, args.profile_csv, args.das, args.arr, args.first_frame,
+         args.width, args.height, args.cell_size)
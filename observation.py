@@ -0,0 +1,320 @@
+"""
+    Shares the state of running games with agents in other processes through one block
+    of shared memory. Every game has a fixed layout record (LAYOUT) that the game
+    writes in place and agents read as a NumPy view, so nothing is pickled or copied
+    through a pipe.
+
+    Both directions use sequence counters instead of locks:
+        - the game makes "sequence" odd while it writes a record and even again when
+          it is done, so a reader retries when the counter was odd or changed while
+          it copied the record
+        - an agent writes "action", then increments "action_sequence". The game
+          applies the action, sets "action_done" to that number and publishes the
+          new state
+
+    Run with: python observation.py --games 4 --name tetris
+    and in other processes: python observation.py --agent tetris --steps 10000
+"""
+import argparse
+import random
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from engine import Engine, ACTIONS, PREVIEW
+from settings import WIDTH, HEIGHT
+
+# Action numbers are indexes into this, "advance" runs one logic step
+AGENT_ACTIONS = ACTIONS + ("advance",)
+NO_HOLD = 255
+GAME_OVER = 1
+# Names of the blocks created by this process
+CREATED = set()
+
+LAYOUT = np.dtype([
+    ("sequence", "<u4"),
+    ("action_sequence", "<u4"),
+    ("action_done", "<u4"),
+    ("action", "u1"),
+    ("piece", "u1"),
+    ("rotation", "u1"),
+    ("x", "i1"),
+    ("y", "i1"),
+    ("hold", "u1"),
+    ("next", "u1", (PREVIEW,)),
+    ("flags", "u1"),
+    ("level", "<u2"),
+    ("lines", "<u4"),
+    ("score", "<u4"),
+    ("ticks", "<u4"),
+    ("cells", "u1", (HEIGHT, WIDTH)),
+], align=True)
+
+
+class ObservationBuffer:
+    def __init__(self, count=1, name=None, create=True):
+        """
+            Creates or opens the shared block of count game records.
+
+            Parameters:
+                count (int): Number of games, ignored when opening a block
+                name (str): Name of the shared memory, chosen by the system if None
+                create (bool): True to create the block, False to open an existing one
+
+            Returns:
+                None
+        """
+        if create:
+            self.memory = shared_memory.SharedMemory(name, create=True, size=LAYOUT.itemsize * count)
+            CREATED.add(self.memory.name)
+        else:
+            self.memory = shared_memory.SharedMemory(name)
+            if self.memory.name not in CREATED:
+                # The creator removes the block, not every process that opens it
+                resource_tracker.unregister(self.memory._name, "shared_memory")
+        self.name = self.memory.name
+        self.count = self.memory.size // LAYOUT.itemsize
+        self.records = np.ndarray((self.count,), LAYOUT, buffer=self.memory.buf)
+        if create:
+            self.records[...] = np.zeros((), LAYOUT)
+        # One view per field, so writing a field does not make a new view each time
+        self.fields = {name: self.records[name] for name in LAYOUT.names}
+
+    @classmethod
+    def open(cls, name):
+        """
+            Opens a block another process created.
+
+            Parameters:
+                name (str): Name of the shared memory
+
+            Returns:
+                ObservationBuffer: The block
+        """
+        return cls(name=name, create=False)
+
+    def publish(self, index, engine, action_done=None):
+        """
+            Writes the state of a game into its record. Called by the game's process.
+
+            Parameters:
+                index (int): The record
+                engine (Engine): The game
+                action_done (int): The agent action this state follows, unchanged if None
+
+            Returns:
+                None
+        """
+        fields = self.fields
+        sequence = fields["sequence"]
+        sequence[index] += 1
+        piece = engine.current_piece
+        fields["piece"][index] = piece.index
+        fields["rotation"][index] = piece.rotation
+        fields["x"][index] = piece.x
+        fields["y"][index] = piece.y
+        fields["hold"][index] = NO_HOLD if engine.hold_piece is None else engine.hold_piece.index
+        fields["next"][index] = engine.next_pieces
+        fields["flags"][index] = GAME_OVER if engine.game_over else 0
+        fields["level"][index] = engine.level
+        fields["lines"][index] = engine.lines_cleared
+        fields["score"][index] = engine.score
+        fields["ticks"][index] = engine.ticks
+        fields["cells"][index].reshape(-1)[:] = np.frombuffer(engine.board.colors, np.uint8)
+        if action_done is not None:
+            fields["action_done"][index] = action_done
+        sequence[index] += 1
+
+    def serve(self, index, engine):
+        """
+            Applies the action an agent sent to a game, if there is a new one, and
+            publishes the state after it. Called by the game's process.
+
+            Parameters:
+                index (int): The record
+                engine (Engine): The game
+
+            Returns:
+                Boolean: True if an action was applied
+        """
+        number = int(self.fields["action_sequence"][index])
+        if number == self.fields["action_done"][index]:
+            return False
+        action = AGENT_ACTIONS[self.fields["action"][index]]
+        if action == "advance":
+            engine.advance()
+        else:
+            engine.apply(action)
+        self.publish(index, engine, number)
+        return True
+
+    def read(self, index):
+        """
+            Copies a consistent record, retrying while the game is writing it.
+
+            Parameters:
+                index (int): The record
+
+            Returns:
+                numpy.void: A copy of the record, fields are read like a dict
+        """
+        sequence = self.fields["sequence"]
+        while True:
+            before = int(sequence[index])
+            if before % 2 == 0:
+                record = self.records[index].copy()
+                if sequence[index] == before:
+                    return record
+
+    def act(self, index, action):
+        """
+            Sends an action to a game. Called by the agent, which waits for the
+            previous action to be done before sending another.
+
+            Parameters:
+                index (int): The record
+                action (str): One of AGENT_ACTIONS
+
+            Returns:
+                int: The action's number, for wait
+        """
+        self.fields["action"][index] = AGENT_ACTIONS.index(action)
+        number = int(self.fields["action_sequence"][index]) + 1
+        self.fields["action_sequence"][index] = number
+        return number
+
+    def wait(self, index, number, timeout=1.0):
+        """
+            Waits until the game has done an action and returns the state after it.
+
+            Parameters:
+                index (int): The record
+                number (int): The number act returned
+                timeout (float): Seconds to wait
+
+            Returns:
+                numpy.void: A copy of the record
+        """
+        deadline = time.perf_counter() + timeout
+        while True:
+            record = self.read(index)
+            if record["action_done"] >= number:
+                return record
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"game {index} did not do action {number}")
+            time.sleep(0)
+
+    def close(self):
+        """
+            Lets go of the block in this process.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        self.fields = {}
+        self.records = None
+        self.memory.close()
+
+    def unlink(self):
+        """
+            Removes the block, called by the process that created it.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        self.memory.unlink()
+        CREATED.discard(self.name)
+
+
+def host(buffer, engines, seconds=None):
+    """
+        Runs games for agents, applying their actions as they arrive.
+
+        Parameters:
+            buffer (ObservationBuffer): The block, one record per game
+            engines (list): The games
+            seconds (float): How long to run, forever if None
+
+        Returns:
+            int: Number of actions applied
+    """
+    for index, engine in enumerate(engines):
+        buffer.publish(index, engine)
+    applied = 0
+    end = None if seconds is None else time.perf_counter() + seconds
+    while end is None or time.perf_counter() < end:
+        served = 0
+        for index, engine in enumerate(engines):
+            served += buffer.serve(index, engine)
+        if not served:
+            # Lets the agents run when they share a core with the games
+            time.sleep(0)
+        applied += served
+    return applied
+
+
+def random_agent(buffer, index, steps, seed=0):
+    """
+        Plays a game through the block with random actions, an example agent.
+
+        Parameters:
+            buffer (ObservationBuffer): The block
+            index (int): The game to play
+            steps (int): Number of actions
+            seed (int): Seed for the actions
+
+        Returns:
+            numpy.void: The last state
+    """
+    rng = random.Random(seed)
+    record = buffer.read(index)
+    for _ in range(steps):
+        if record["flags"] & GAME_OVER:
+            break
+        action = rng.choice(("left", "right", "rotate", "advance", "advance", "drop"))
+        record = buffer.wait(index, buffer.act(index, action))
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Share running games with agents in other processes.")
+    parser.add_argument("--games", type=int, default=1)
+    parser.add_argument("--name", default="tetris", help="name of the shared memory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seconds", type=float, help="stop hosting after this long")
+    parser.add_argument("--agent", help="play with random actions on the named block instead of hosting")
+    parser.add_argument("--index", type=int, default=0, help="game played by --agent")
+    parser.add_argument("--steps", type=int, default=10000)
+    args = parser.parse_args()
+
+    if args.agent:
+        buffer = ObservationBuffer.open(args.agent)
+        start = time.perf_counter()
+        record = random_agent(buffer, args.index, args.steps, args.seed)
+        elapsed = time.perf_counter() - start
+        print(f"game {args.index}: score {record['score']} lines {record['lines']}, "
+              f"{record['action_done']} actions, {record['action_done'] / elapsed:.0f} steps/s")
+        buffer.close()
+        return
+
+    buffer = ObservationBuffer(args.games, args.name)
+    engines = [Engine(args.seed + index) for index in range(args.games)]
+    print(f"hosting {args.games} games in shared memory {buffer.name!r}")
+    try:
+        host(buffer, engines, args.seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        buffer.close()
+        buffer.unlink()
+
+
+if __name__ == '__main__':
+    main()
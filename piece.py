@@ -1,14 +1,52 @@
 import random
-from settings import WIDTH, HEIGHT, SHAPES, grid, COLORS, BLOCK_TEXTURES
+from board import Board
+from tetrominoes import ROTATIONS, LABELS, PIECE_COLORS, KICKS, spawn_column
 
 
 class Piece:
-    def __init__(self):
-        self.label, self.shape = random.choice(SHAPES)
-        self.color = max(max(row) for row in self.shape)
-        self.x = WIDTH // 2 - len(self.shape[0]) // 2
+    def __init__(self, index=None, board=None):
+        """
+            Creates a piece. Its shape comes from the precomputed ROTATIONS table,
+            so the piece only stores which shape it is and which rotation it is in.
+
+            Parameters:
+                index (int): Index of the shape in SHAPES, random if None
+                board (Board): The board the piece moves on, a new empty one if None
+
+            Returns:
+                None
+        """
+        self.index = random.randrange(len(ROTATIONS)) if index is None else index
+        self.board = Board() if board is None else board
+        self.rotation = 0
+        self.label = LABELS[self.index]
+        self.color = PIECE_COLORS[self.index]
+        self.x = spawn_column(ROTATIONS[self.index][0], self.board.width)
         self.y = 0
         self.locked = False
+        # Cached result of landing_y and the position it was worked out for
+        self.landing = None
+        self.landing_key = None
+
+    @property
+    def state(self):
+        """The Rotation entry of the current rotation."""
+        return ROTATIONS[self.index][self.rotation]
+
+    @property
+    def shape(self):
+        """The nested list shape of the current rotation."""
+        return ROTATIONS[self.index][self.rotation].shape
+
+    @property
+    def cells(self):
+        """The (x, y) offsets of the filled cells."""
+        return ROTATIONS[self.index][self.rotation].cells
+
+    @property
+    def masks(self):
+        """The row bitmasks used for collisions."""
+        return ROTATIONS[self.index][self.rotation].masks
 
     def move(self, dir_x, dir_y):
         """
@@ -37,10 +75,7 @@ class Piece:
             Returns:
                 None
         """
-        for i, row in enumerate(self.shape):
-            for j, cell in enumerate(row):
-                if cell:
-                    grid[self.y + i][self.x + j] = BLOCK_TEXTURES[str(self.color)]
+        self.board.lock(self.masks, self.x, self.y, self.color)
         self.locked = True
 
     def is_valid(self, dir_x, dir_y):
@@ -54,16 +89,7 @@ class Piece:
             Returns:
                 Boolean: True if the move is valid, False if not
         """
-        for i, row in enumerate(self.shape):
-            for j, cell in enumerate(row):
-                if cell:
-                    new_x = self.x + j + dir_x
-                    new_y = self.y + i + dir_y
-                    if new_x < 0 or new_x >= WIDTH or new_y >= HEIGHT:
-                        return True
-                    if new_y >= 0 and grid[new_y][new_x] != 0:
-                        return True
-        return False
+        return self.board.collides(self.masks, self.x + dir_x, self.y + dir_y)
 
     def rotate(self):
         """
@@ -75,20 +101,7 @@ class Piece:
             Returns:
                 None
         """
-        prev_shape = self.shape
-        self.shape = [list(row) for row in zip(*self.shape[::-1])]
-        for i, row in enumerate(self.shape):
-            for j, cell in enumerate(row):
-                if cell:
-                    new_x = self.x + j
-                    new_y = self.y + i
-                    # Check for out-of-bounds or collision
-                    if new_x < 0 or new_x >= WIDTH or new_y >= HEIGHT:
-                        self.shape = prev_shape
-                        return
-                    if new_y >= 0 and grid[new_y][new_x] != 0:
-                        self.shape = prev_shape
-                        return
+        self.turn_to((self.rotation + 1) % 4)
 
     def rotate_ccw(self):
         """
@@ -100,20 +113,27 @@ class Piece:
             Returns:
                 None
         """
-        old_shape = self.shape
-        self.shape = [list(row) for row in zip(*self.shape)][::-1]
-        for i, row in enumerate(self.shape):
-            for j, cell in enumerate(row):
-                if cell:
-                    new_x = self.x + j
-                    new_y = self.y + i
-                    # Check for out-of-bounds or collision
-                    if new_x < 0 or new_x >= WIDTH or new_y >= HEIGHT:
-                        self.shape = old_shape
-                        return
-                    if new_y >= 0 and grid[new_y][new_x] != 0:
-                        self.shape = old_shape
-                        return
+        self.turn_to((self.rotation - 1) % 4)
+
+    def turn_to(self, rotation):
+        """
+            Switches to another rotation state if it fits, trying each offset in KICKS.
+
+            Parameters:
+                rotation (int): The rotation index to switch to
+
+            Returns:
+                Boolean: True if the piece rotated, False if it was blocked
+        """
+        masks = ROTATIONS[self.index][rotation].masks
+        for kick_x, kick_y in KICKS:
+            # Check for out-of-bounds or collision
+            if not self.board.collides(masks, self.x + kick_x, self.y + kick_y):
+                self.rotation = rotation
+                self.x += kick_x
+                self.y += kick_y
+                return True
+        return False
 
     def instant_drop(self):
         """
@@ -125,6 +145,23 @@ class Piece:
             Returns:
                 None
         """ 
-        while not self.is_valid(0, 1):
-            self.y += 1
-        self.stop()     
+        self.y = self.landing_y()
+        self.stop()
+
+    def landing_y(self):
+        """
+            Finds the row this piece would land on if it dropped straight down. The
+            result is kept until the piece moves or rotates or the board changes.
+
+            Parameters:
+                None
+
+            Returns:
+                int: The row the piece would lock at
+        """
+        key = (self.rotation, self.x, self.y, self.board.version)
+        if key != self.landing_key:
+            state = ROTATIONS[self.index][self.rotation]
+            self.landing = self.board.landing_y(state.masks, state.bottoms, self.x, self.y)
+            self.landing_key = key
+        return self.landing     
@@ -0,0 +1,202 @@
+import csv
+from collections import deque
+from time import perf_counter_ns
+
+import pygame
+
+from fonts import get_font
+from settings import BLACK, WHITE
+
+# Game methods timed while profiling is on, in the order they are shown
+GAME_STAGES = ("advance", "update", "draw_grid", "draw_ghost_piece", "draw_piece", "side_panel",
+               "step", "clear_lines", "new_piece")
+
+
+class Profiler:
+    def __init__(self, frames=600, enabled=False):
+        """
+            Times the stages of each frame and keeps the last few hundred frames.
+            Game methods are timed by wrapping them on the instance, so while the
+            profiler is off the game runs its normal methods and pays nothing.
+
+            Parameters:
+                frames (int): Number of frames kept
+                enabled (bool): Whether to start timing straight away
+
+            Returns:
+                None
+        """
+        self.enabled = enabled
+        self.frames = deque(maxlen=frames)
+        self.stages = []
+        self.current = {}
+        self.game = None
+        # The overlay text is only rendered again every refresh frames
+        self.refresh = 30
+        self.overlay = []
+        self.overlay_age = 0
+
+    def record(self, name, ns):
+        """
+            Adds time spent in a stage to the current frame.
+
+            Parameters:
+                name (str): The stage
+                ns (int): Nanoseconds spent in it
+
+            Returns:
+                None
+        """
+        if not self.enabled:
+            return
+        if name not in self.current:
+            self.current[name] = 0
+            if name not in self.stages:
+                self.stages.append(name)
+        self.current[name] += ns
+
+    def timed(self, name, method):
+        """
+            Wraps a method so every call of it is recorded as a stage.
+
+            Parameters:
+                name (str): The stage
+                method (function): The bound method to time
+
+            Returns:
+                function: The wrapped method
+        """
+        record = self.record
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record(name, perf_counter_ns() - start)
+        return wrapper
+
+    def attach(self, game):
+        """
+            Starts timing the GAME_STAGES of a game, if the profiler is on.
+
+            Parameters:
+                game (Game): The game being played
+
+            Returns:
+                None
+        """
+        self.detach()
+        self.game = game
+        if self.enabled:
+            for name in GAME_STAGES:
+                setattr(game, name, self.timed(name, getattr(game, name)))
+
+    def detach(self):
+        """
+            Puts back the normal methods of the attached game.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        if self.game is not None:
+            for name in GAME_STAGES:
+                self.game.__dict__.pop(name, None)
+
+    def toggle(self):
+        """
+            Turns profiling and its overlay on or off.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        self.enabled = not self.enabled
+        self.current = {}
+        self.overlay = []
+        if self.game is not None:
+            self.attach(self.game)
+
+    def end_frame(self):
+        """
+            Stores the times of the frame that just finished.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        if self.enabled:
+            self.frames.append(self.current)
+            self.current = {}
+
+    def percentiles(self, name):
+        """
+            Works out the 50th and 99th percentile time of a stage over the kept frames
+            it ran in.
+
+            Parameters:
+                name (str): The stage
+
+            Returns:
+                tuple: (p50, p99) in milliseconds
+        """
+        times = sorted(frame[name] for frame in self.frames if name in frame)
+        if not times:
+            return 0.0, 0.0
+        return (times[len(times) // 2] / 1e6,
+                times[min(len(times) - 1, len(times) * 99 // 100)] / 1e6)
+
+    def draw(self, screen, fps, target_fps):
+        """
+            Draws the stage times and frame rate in the top left corner of the window.
+
+            Parameters:
+                screen (pygame.Surface): The window
+                fps (float): The frame rate achieved, from Clock.get_fps
+                target_fps (int): The frame rate passed to Clock.tick
+
+            Returns:
+                pygame.Rect: The area drawn over
+        """
+        if not self.overlay or self.overlay_age >= self.refresh:
+            font = get_font(16, name="Courier New")
+            lines = [f"FPS {fps:5.1f} / {target_fps}", f"{'stage':18s}{'p50':>7s}{'p99':>7s} ms"]
+            for name in self.stages:
+                p50, p99 = self.percentiles(name)
+                lines.append(f"{name:18s}{p50:7.2f}{p99:7.2f}")
+            self.overlay = [font.render(line, True, WHITE) for line in lines]
+            self.overlay_age = 0
+        self.overlay_age += 1
+        width = max(surface.get_width() for surface in self.overlay) + 10
+        height = sum(surface.get_height() for surface in self.overlay) + 10
+        rect = pygame.Rect(0, 0, width, height)
+        pygame.draw.rect(screen, BLACK, rect)
+        y = 5
+        for surface in self.overlay:
+            screen.blit(surface, (5, y))
+            y += surface.get_height()
+        return rect
+
+    def write_csv(self, path):
+        """
+            Writes the kept frames to a CSV file, one row per frame and one column
+            per stage in nanoseconds.
+
+            Parameters:
+                path (str): The file to write
+
+            Returns:
+                None
+        """
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame"] + self.stages)
+            for number, frame in enumerate(self.frames):
+                writer.writerow([number] + [frame.get(name, 0) for name in self.stages])
@@ -0,0 +1,161 @@
+import random
+from array import array
+from collections import deque
+
+from tetrominoes import ROTATIONS
+
+MASK64 = (1 << 64) - 1
+PIECE_COUNT = len(ROTATIONS)
+
+
+def splitmix64(value):
+    """
+        Scrambles a seed so that nearby seeds give unrelated generator states.
+
+        Parameters:
+            value (int): Any integer
+
+        Returns:
+            int: A non zero 64 bit number
+    """
+    value = (value + 0x9E3779B97F4A7C15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return (value ^ (value >> 31)) or 1
+
+
+class Randomizer:
+    def __init__(self, seed=None, mode="bag", chunk_bags=4):
+        """
+            Deals piece indexes from a small xorshift64* generator whose whole state is one
+            64 bit number. In "bag" mode every 7 pieces are one of each shape in a random
+            order, in "random" mode every piece is drawn on its own. Pieces are made a
+            chunk at a time into a byte array, so looking ahead costs nothing.
+
+            Parameters:
+                seed (int): Seed of the generator, random if None
+                mode (str): "bag" or "random"
+                chunk_bags (int): Number of bags made per chunk
+
+            Returns:
+                None
+        """
+        if mode not in ("bag", "random"):
+            raise ValueError(f"unknown randomizer mode {mode!r}")
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.mode = mode
+        self.chunk_size = PIECE_COUNT * chunk_bags
+        self.state = splitmix64(self.seed)
+        # Pieces made but not dealt yet, starting with the chunk the next piece is in
+        self.pieces = array('B')
+        # Generator state at the start of each chunk held in self.pieces
+        self.chunk_states = deque()
+        # How many pieces of the first chunk were already dealt
+        self.offset = 0
+
+    def next_int(self, bound):
+        """
+            Steps the generator and returns a number from 0 to bound - 1.
+
+            Parameters:
+                bound (int): One more than the largest number wanted
+
+            Returns:
+                int: The random number
+        """
+        state = self.state
+        state ^= state >> 12
+        state ^= (state << 25) & MASK64
+        state ^= state >> 27
+        self.state = state
+        return (((state * 0x2545F4914F6CDD1D) & MASK64) >> 32) % bound
+
+    def fill(self):
+        """
+            Makes one more chunk of pieces and adds it to the end of the queue.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        self.chunk_states.append(self.state)
+        if self.mode == "random":
+            self.pieces.extend(self.next_int(PIECE_COUNT) for _ in range(self.chunk_size))
+            return
+        for _ in range(self.chunk_size // PIECE_COUNT):
+            bag = list(range(PIECE_COUNT))
+            for i in range(PIECE_COUNT - 1, 0, -1):
+                j = self.next_int(i + 1)
+                bag[i], bag[j] = bag[j], bag[i]
+            self.pieces.extend(bag)
+
+    def peek(self, count):
+        """
+            Returns the next pieces without dealing them.
+
+            Parameters:
+                count (int): How many pieces to look at
+
+            Returns:
+                array: The shape indexes of the next count pieces
+        """
+        while len(self.pieces) - self.offset < count:
+            self.fill()
+        return self.pieces[self.offset:self.offset + count]
+
+    def next(self):
+        """
+            Deals the next piece.
+
+            Parameters:
+                None
+
+            Returns:
+                int: The shape index of the piece
+        """
+        if self.offset >= len(self.pieces):
+            self.fill()
+        piece = self.pieces[self.offset]
+        self.offset += 1
+        if self.offset == self.chunk_size:
+            del self.pieces[:self.chunk_size]
+            self.chunk_states.popleft()
+            self.offset = 0
+        return piece
+
+    def get_state(self):
+        """
+            Returns what is needed to deal the same pieces again from this point.
+
+            Parameters:
+                None
+
+            Returns:
+                tuple: (generator state at the start of the current chunk, pieces dealt from it)
+        """
+        if not self.chunk_states:
+            self.fill()
+        return self.chunk_states[0], self.offset
+
+    def set_state(self, state):
+        """
+            Goes back to a point saved by get_state.
+
+            Parameters:
+                state (tuple): The value returned by get_state
+
+            Returns:
+                None
+        """
+        state, offset = state
+        if self.chunk_states and self.chunk_states[0] == state:
+            # Still in the same chunk, the pieces made are the same
+            self.offset = offset
+            return
+        self.state = state
+        self.pieces = array('B')
+        self.chunk_states.clear()
+        self.fill()
+        self.offset = offset
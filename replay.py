@@ -0,0 +1,208 @@
+"""
+    Records the inputs of a game to a JSON lines file and replays them headless at full speed.
+
+    A recording holds one or more games. Each game is a header line with the seed,
+    randomizer mode and, when it is not the default, the board size, then one
+    [frame, action] line per input ("tick" for a gravity tick, "pause" for P,
+    otherwise one of engine.ACTIONS), and a result line with the final score, lines,
+    pieces and board hash once the game ends. In games recorded with "logic" in the
+    header, frame is the Engine.advance step the input came before, and the result
+    line also holds the number of steps the game ran.
+
+    Run with: python replay.py recording.jsonl [more.jsonl ...]
+"""
+import hashlib
+import json
+import sys
+import time
+
+from board import Board
+from engine import Engine
+from settings import WIDTH, HEIGHT
+
+
+def board_hash(board):
+    """
+        Hashes the cells of a board, so two boards can be compared without storing them.
+
+        Parameters:
+            board (Board): The board to hash
+
+        Returns:
+            str: 16 hex digits
+    """
+    return hashlib.blake2b(bytes(board.colors), digest_size=8).hexdigest()
+
+
+def game_result(engine):
+    """
+        Collects what a finished game is checked against.
+
+        Parameters:
+            engine (Engine): The game
+
+        Returns:
+            dict: The score, lines, pieces and board hash
+    """
+    return {
+        "score": engine.score,
+        "lines": engine.lines_cleared,
+        "pieces": engine.pieces_locked,
+        "hash": board_hash(engine.board),
+    }
+
+
+class Recorder:
+    def __init__(self, path):
+        """
+            Opens a recording file, new games are added to the end of it.
+
+            Parameters:
+                path (str): The file to write to
+
+            Returns:
+                None
+        """
+        self.file = open(path, "a")
+
+    def start(self, engine, logic=False):
+        """
+            Starts recording a new game.
+
+            Parameters:
+                engine (Engine): The game that is starting
+                logic (bool): True if the game is driven by Engine.advance and the
+                    recorded frames are its step numbers
+
+            Returns:
+                None
+        """
+        header = {"seed": engine.seed, "mode": engine.randomizer.mode}
+        if (engine.board.width, engine.board.height) != (WIDTH, HEIGHT):
+            header["width"] = engine.board.width
+            header["height"] = engine.board.height
+        if logic:
+            header["logic"] = True
+        self.file.write(json.dumps(header) + "\n")
+
+    def record(self, frame, action):
+        """
+            Records one input.
+
+            Parameters:
+                frame (int): The frame the input was handled on
+                action (str): "tick", "pause" or one of engine.ACTIONS
+
+            Returns:
+                None
+        """
+        self.file.write(f'[{frame},"{action}"]\n')
+
+    def finish(self, engine):
+        """
+            Records the result of the game, which the replay is checked against.
+
+            Parameters:
+                engine (Engine): The game that ended
+
+            Returns:
+                None
+        """
+        self.file.write(json.dumps(dict(game_result(engine), ticks=engine.ticks)) + "\n")
+        self.file.flush()
+
+    def close(self):
+        """
+            Closes the recording file.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        self.file.close()
+
+
+def load(path):
+    """
+        Reads a recording.
+
+        Parameters:
+            path (str): The recording file
+
+        Returns:
+            list: One dict per game with its "seed", "mode", "logic" flag, board "width"
+                and "height", "actions", the "frames" they were recorded on, the "ticks"
+                the game ran and the "expected" result, which is None if the recording
+                was cut short
+    """
+    games = []
+    with open(path) as f:
+        for line in f:
+            entry = json.loads(line)
+            if isinstance(entry, list):
+                games[-1]["frames"].append(entry[0])
+                games[-1]["actions"].append(entry[1])
+            elif "seed" in entry:
+                games.append({"seed": entry["seed"], "mode": entry["mode"], "logic": entry.get("logic", False),
+                              "width": entry.get("width", WIDTH), "height": entry.get("height", HEIGHT),
+                              "frames": [], "actions": [], "ticks": None, "expected": None})
+            else:
+                games[-1]["ticks"] = entry.pop("ticks", None)
+                games[-1]["expected"] = entry
+    return games
+
+
+def replay(game):
+    """
+        Plays a recorded game again as fast as possible.
+
+        Parameters:
+            game (dict): One game returned by load
+
+        Returns:
+            dict: The result of the replayed game
+    """
+    engine = Engine(game["seed"], Board(game["width"], game["height"]), game["mode"])
+    logic = game["logic"]
+    for frame, action in zip(game["frames"], game["actions"]):
+        while logic and engine.ticks < frame:
+            engine.advance()
+        if action == "tick":
+            engine.tick()
+        elif action == "pause":
+            engine.paused = not engine.paused
+        else:
+            engine.apply(action)
+    while logic and game["ticks"] is not None and engine.ticks < game["ticks"]:
+        engine.advance()
+    return game_result(engine)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python replay.py recording.jsonl [more.jsonl ...]")
+        sys.exit(2)
+    mismatches = 0
+    total_actions = 0
+    start = time.perf_counter()
+    for path in sys.argv[1:]:
+        for number, game in enumerate(load(path)):
+            result = replay(game)
+            total_actions += len(game["actions"])
+            status = "ok"
+            if game["expected"] is None:
+                status = "no result recorded"
+            elif game["expected"] != result:
+                status = f"MISMATCH, recorded {game['expected']}"
+                mismatches += 1
+            print(f"{path}#{number} seed={game['seed']} score={result['score']} lines={result['lines']} "
+                  f"pieces={result['pieces']} hash={result['hash']} {status}")
+    elapsed = time.perf_counter() - start
+    print(f"{total_actions} inputs in {elapsed:.3f}s ({total_actions / max(elapsed, 1e-9):,.0f} inputs/s)")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+    Measures how frame time and memory grow with the size of the board. Every size is
+    measured in a new Python process, so the key tables and caches of one size are not
+    counted in the next. Each board is half full of rows with one hole, and the frames
+    timed are:
+
+        idle      nothing changed
+        move      the piece moved one column
+        lock      a piece was hard dropped onto the stack and the next one spawned
+        clear     the bottom row was cleared and the stack moved down
+        full      every cell drawn again, as on the first frame
+
+    Memory is the Python memory the game allocated (tracemalloc), the pixels of its
+    surfaces and the peak resident size of the process.
+
+    Run with: python scaling.py --sizes 10x20 50x100 200x400 --frame-budget 16.7
+    The run fails if the median lock or clear frame of a size takes longer than the
+    budget (ms).
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tracemalloc
+
+from benchmark import make_board, fill_bottom_row, move_back_and_forth, measure
+from game import Game
+from leaderboard import Leaderboard
+from piece import Piece
+
+SIZES = ("10x20", "20x40", "50x100", "100x200", "200x400", "400x800")
+# Frames that change the board, the ones the budget applies to
+BOARD_FRAMES = ("lock", "clear")
+
+
+def surface_bytes(game):
+    """
+        Adds up the pixels of the surfaces a game draws on.
+
+        Parameters:
+            game (Game): The game
+
+        Returns:
+            int: Bytes of pixel data
+    """
+    return sum(surface.get_width() * surface.get_height() * surface.get_bytesize()
+               for surface in (game.screen, game.board_layer, game.empty_row))
+
+
+def measure_size(width, height, seconds, max_calls):
+    """
+        Times the frames of a game on a board of one size and measures its memory.
+
+        Parameters:
+            width (int): Columns of the board
+            height (int): Rows of the board
+            seconds (float): Time spent on each frame
+            max_calls (int): Most frames timed for each
+
+        Returns:
+            dict: The cell size, the measure results of every frame keyed by its name,
+                and "python_mb", "surface_mb" and "rss_mb"
+    """
+    tracemalloc.start()
+    board = make_board(height // 2, 1, 1, width, height)
+    game = Game(seed=1, board=board.copy(), leaderboard=Leaderboard(":memory:"))
+    game.update()
+    # Hashes every row of the stack once, as a clear does
+    fill_bottom_row(game.board)
+    game.clear_lines()
+    game.update()
+    python_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    def start_over():
+        # Puts the stack back and draws it, untimed, so only the frame itself is timed
+        game.board.restore(board.rows, board.colors, board.zobrist)
+        game.current_piece = Piece(game.current_piece.index, game.board)
+        game.draw_grid()
+
+    def full_row():
+        start_over()
+        fill_bottom_row(game.board)
+        game.draw_grid()
+
+    def forget():
+        game.forget_grid()
+        game.redraw_all = True
+
+    def drop(_):
+        game.apply("drop")
+        game.update()
+
+    def clear(_):
+        game.clear_lines()
+        game.update()
+
+    start_over()
+    game.update()
+    result = {
+        "cell_size": game.cell_size,
+        "idle": measure(None, lambda _: game.update(), seconds, max_calls),
+        "move": measure(lambda: move_back_and_forth(game), lambda _: game.update(), seconds, max_calls),
+        "lock": measure(start_over, drop, seconds, max_calls),
+        "clear": measure(full_row, clear, seconds, max_calls),
+        "full": measure(forget, lambda _: game.update(), seconds, max_calls),
+    }
+    result["python_mb"] = python_bytes / 1e6
+    result["surface_mb"] = surface_bytes(game) / 1e6
+    result["rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+    return result
+
+
+def measure_in_process(size, seconds, max_calls):
+    """
+        Runs measure_size for one size in a new Python process.
+
+        Parameters:
+            size (str): "WIDTHxHEIGHT"
+            seconds (float): Time spent on each frame
+            max_calls (int): Most frames timed for each
+
+        Returns:
+            dict: The result of measure_size
+    """
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--one", size,
+                             "--seconds", str(seconds), "--max-calls", str(max_calls)],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure frame time and memory as the board grows.")
+    parser.add_argument("--sizes", nargs="+", default=SIZES, help="board sizes as WIDTHxHEIGHT")
+    parser.add_argument("--seconds", type=float, default=0.3, help="time spent on each frame")
+    parser.add_argument("--max-calls", type=int, default=2000)
+    parser.add_argument("--frame-budget", type=float, help="most milliseconds a lock or clear frame may take")
+    parser.add_argument("--one", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one:
+        width, height = map(int, args.one.split("x"))
+        print(json.dumps(measure_size(width, height, args.seconds, args.max_calls)))
+        return
+
+    frames = ("idle", "move", "lock", "clear", "full")
+    print(f"{'board':>9s}{'cell':>5s}" + "".join(f"{name + ' us':>11s}" for name in frames)
+          + f"{'python MB':>11s}{'pixels MB':>11s}{'rss MB':>9s}")
+    failures = []
+    for size in args.sizes:
+        result = measure_in_process(size, args.seconds, args.max_calls)
+        print(f"{size:>9s}{result['cell_size']:5d}" + "".join(f"{result[name]['p50_us']:11.1f}" for name in frames)
+              + f"{result['python_mb']:11.1f}{result['surface_mb']:11.1f}{result['rss_mb']:9.1f}", flush=True)
+        for name in BOARD_FRAMES:
+            if args.frame_budget is not None and result[name]["p50_us"] > args.frame_budget * 1000:
+                failures.append(f"{name} frame on {size}")
+
+    for name in failures:
+        print(f"{name} is over budget")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+from time import perf_counter_ns
+
+from engine import TICKS_PER_SECOND
+
+
+class FixedTimestep:
+    def __init__(self, rate=TICKS_PER_SECOND, max_steps=TICKS_PER_SECOND * 5, clock=perf_counter_ns):
+        """
+            Works out how many fixed logic steps are due since it was last asked.
+            Real time is added to an accumulator and whole steps are taken out of it,
+            so logic runs at the same rate however fast or slow frames are drawn.
+
+            Parameters:
+                rate (int): Logic steps per second
+                max_steps (int): Most steps returned at once, anything older is
+                    dropped so a long stall (like dragging the window) does not
+                    make the game race to catch up
+                clock (function): Returns the time in nanoseconds
+
+            Returns:
+                None
+        """
+        self.step_ns = 1_000_000_000 // rate
+        self.max_steps = max_steps
+        self.clock = clock
+        self.last = clock()
+        self.accumulator = 0
+
+    def due(self):
+        """
+            Returns how many logic steps should run now.
+
+            Parameters:
+                None
+
+            Returns:
+                int: The number of steps
+        """
+        now = self.clock()
+        self.accumulator += now - self.last
+        self.last = now
+        steps = self.accumulator // self.step_ns
+        self.accumulator -= steps * self.step_ns
+        return min(steps, self.max_steps)
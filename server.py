@@ -0,0 +1,716 @@
+"""
+    Hosts many headless games in one process for bot ladders and versus matches.
+    Clients connect over TCP or a Unix socket, create sessions, send actions and
+    subscribe to the state of any session.
+
+    Every message is a little endian uint16 length followed by that many bytes, the
+    first of which is the message type:
+
+        client to server
+            CREATE     B type, I seed                   answered with CREATED
+            ACTION     B type, I session, B action      index into engine.ACTIONS
+            SUBSCRIBE  B type, I session                answered with a full STATE
+            CLOSE      B type, I session
+            METRICS    B type, I session                answered with METRICS
+
+        server to client
+            CREATED    B type, I session
+            STATE      the STATE header, then per changed row B y and one color
+                       byte per column. Pushed to subscribers whenever the session
+                       changes, with only the rows that changed since the last push
+            METRICS    B type, I session, I ticks measured, I p50 us, I p99 us
+            ERROR      B type, B code
+
+    Gravity runs from one timer wheel for every session. A session is only woken on
+    the logic step where its piece falls or locks; the steps in between are skipped
+    in one go, so idle sessions cost nothing per step. A session whose step raises
+    is closed, the others keep running.
+
+    Run with: python server.py --port 7000       (or --unix /tmp/tetris.sock)
+              python server.py --bench 5000      to time 5000 sessions without sockets
+"""
+import argparse
+import asyncio
+import random
+import struct
+import time
+from collections import deque
+from time import perf_counter_ns
+
+from engine import Engine, ACTIONS, TICKS_PER_SECOND
+from scheduler import FixedTimestep
+
+CREATE, ACTION, SUBSCRIBE, CLOSE, METRICS = 1, 2, 3, 4, 5
+CREATED, STATE, METRICS_REPLY, ERROR = 128, 129, 130, 131
+# Error codes
+UNKNOWN_SESSION, BAD_MESSAGE = 1, 2
+
+FRAME = struct.Struct("<H")
+SESSION = struct.Struct("<BI")
+ACTION_MESSAGE = struct.Struct("<BIB")
+METRICS_MESSAGE = struct.Struct("<BIIII")
+ERROR_MESSAGE = struct.Struct("<BB")
+# type, session, tick, score, lines, level, piece, rotation, x, y, hold (255 for none),
+# flags (1 game over), number of rows that follow
+STATE_HEADER = struct.Struct("<BIQQQHBBbbBBB")
+NO_HOLD = 255
+GAME_OVER = 1
+
+# Tick latencies kept for each session
+LATENCY_SAMPLES = 256
+# Subscribers more than this many bytes behind are dropped
+MAX_BUFFER = 1 << 20
+
+
+def frame(body):
+    """
+        Puts the length in front of a message.
+
+        Parameters:
+            body (bytes): The message
+
+        Returns:
+            bytes: The framed message
+    """
+    return FRAME.pack(len(body)) + body
+
+
+class TimerWheel:
+    def __init__(self, slots=256):
+        """
+            Schedules items on future logic steps. Each step has a slot, found by the
+            step modulo the number of slots, so scheduling and taking out what is
+            due costs the same however many items are waiting.
+
+            Parameters:
+                slots (int): Number of slots, items further ahead wait whole turns
+
+            Returns:
+                None
+        """
+        self.slots = [[] for _ in range(slots)]
+        self.tick = 0
+
+    def schedule(self, item, tick):
+        """
+            Adds an item to a future step.
+
+            Parameters:
+                item: Anything
+                tick (int): The step, after the current one
+
+            Returns:
+                None
+        """
+        self.slots[tick % len(self.slots)].append((tick, item))
+
+    def advance(self):
+        """
+            Moves on one step.
+
+            Parameters:
+                None
+
+            Returns:
+                list: The items scheduled for the new step
+        """
+        self.tick += 1
+        slot = self.slots[self.tick % len(self.slots)]
+        due = [item for tick, item in slot if tick == self.tick]
+        if len(due) == len(slot):
+            slot.clear()
+        else:
+            slot[:] = [(tick, item) for tick, item in slot if tick != self.tick]
+        return due
+
+
+class Session:
+    def __init__(self, number, seed, tick):
+        """
+            One game hosted by the server.
+
+            Parameters:
+                number (int): The session id
+                seed (int): Seed for the pieces
+                tick (int): The server step the game starts on
+
+            Returns:
+                None
+        """
+        self.number = number
+        self.engine = Engine(seed)
+        self.start = tick
+        # The server step the session is woken on, None if it is not scheduled
+        self.due = None
+        self.subscribers = set()
+        # The colors and header last pushed to the subscribers
+        self.sent_colors = None
+        self.sent_header = None
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def catch_up(self, tick):
+        """
+            Skips the steps since the session last ran, nothing happens in them.
+
+            Parameters:
+                tick (int): The server step to catch up to
+
+            Returns:
+                None
+        """
+        steps = tick - self.start - self.engine.ticks
+        if steps > 0:
+            self.engine.skip(steps)
+
+    def header(self):
+        """
+            Returns everything in a STATE message but the tick and rows.
+
+            Parameters:
+                None
+
+            Returns:
+                tuple: (score, lines, level, piece, rotation, x, y, hold, flags)
+        """
+        engine = self.engine
+        piece = engine.current_piece
+        hold = NO_HOLD if engine.hold_piece is None else engine.hold_piece.index
+        return (engine.score, engine.lines_cleared, engine.level, piece.index, piece.rotation,
+                piece.x, piece.y, hold, GAME_OVER if engine.game_over else 0)
+
+    def encode(self, header, rows):
+        """
+            Builds a STATE message.
+
+            Parameters:
+                header (tuple): The output of header
+                rows (list): The rows to include
+
+            Returns:
+                bytes: The framed message
+        """
+        board = self.engine.board
+        width = board.width
+        parts = [STATE_HEADER.pack(STATE, self.number, self.engine.ticks, *header, len(rows))]
+        for y in rows:
+            parts.append(bytes((y,)))
+            parts.append(board.colors[y * width:(y + 1) * width])
+        return frame(b"".join(parts))
+
+    def snapshot(self):
+        """
+            Builds a STATE message with every row, for a new subscriber. Deltas
+            carry on from this state, earlier subscribers already have it since
+            every change is pushed to them.
+
+            Parameters:
+                None
+
+            Returns:
+                bytes: The framed message
+        """
+        self.sent_header = self.header()
+        self.sent_colors = bytes(self.engine.board.colors)
+        return self.encode(self.sent_header, range(self.engine.board.height))
+
+    def delta(self):
+        """
+            Builds a STATE message with the rows that changed since the last message.
+
+            Parameters:
+                None
+
+            Returns:
+                bytes: The framed message, None if nothing changed
+        """
+        board = self.engine.board
+        header = self.header()
+        colors = bytes(board.colors)
+        if header == self.sent_header and colors == self.sent_colors:
+            return None
+        width = board.width
+        rows = [y for y in range(board.height)
+                if colors[y * width:(y + 1) * width] != self.sent_colors[y * width:(y + 1) * width]]
+        self.sent_header = header
+        self.sent_colors = colors
+        return self.encode(header, rows)
+
+    def percentiles(self):
+        """
+            Works out the 50th and 99th percentile tick latency, the time from when a
+            step was due to when this session had run it.
+
+            Parameters:
+                None
+
+            Returns:
+                tuple: (p50, p99) in microseconds
+        """
+        times = sorted(self.latencies)
+        if not times:
+            return 0, 0
+        return times[len(times) // 2] // 1000, times[min(len(times) - 1, len(times) * 99 // 100)] // 1000
+
+
+def decode_state(body):
+    """
+        Reads a STATE message, for clients.
+
+        Parameters:
+            body (bytes): The message without its length
+
+        Returns:
+            tuple: (fields, rows) where fields is a dict and rows maps each row
+                number sent to its colors
+    """
+    values = STATE_HEADER.unpack_from(body)
+    names = ("session", "tick", "score", "lines", "level", "piece", "rotation", "x", "y", "hold", "flags")
+    fields = dict(zip(names, values[1:-1]))
+    count = values[-1]
+    rows = {}
+    if count:
+        width = (len(body) - STATE_HEADER.size) // count - 1
+        offset = STATE_HEADER.size
+        for _ in range(count):
+            rows[body[offset]] = bytes(body[offset + 1:offset + 1 + width])
+            offset += 1 + width
+    return fields, rows
+
+
+class Server:
+    def __init__(self, rate=TICKS_PER_SECOND, slots=256):
+        """
+            Owns every session and runs their logic steps.
+
+            Parameters:
+                rate (int): Logic steps per second
+                slots (int): Slots of the timer wheel
+
+            Returns:
+                None
+        """
+        self.sessions = {}
+        self.next_number = 1
+        self.wheel = TimerWheel(slots)
+        self.timestep = FixedTimestep(rate)
+        # The sessions each connection subscribed to
+        self.subscriptions = {}
+
+    @property
+    def tick(self):
+        """The current server step."""
+        return self.wheel.tick
+
+    def create(self, seed=None):
+        """
+            Starts a new session.
+
+            Parameters:
+                seed (int): Seed for the pieces, random if None
+
+            Returns:
+                Session: The session
+        """
+        session = Session(self.next_number, seed, self.tick)
+        self.next_number += 1
+        self.sessions[session.number] = session
+        self.schedule(session)
+        return session
+
+    def close(self, session):
+        """
+            Ends a session.
+
+            Parameters:
+                session (Session): The session
+
+            Returns:
+                None
+        """
+        self.sessions.pop(session.number, None)
+        session.due = None
+        for writer in session.subscribers:
+            self.subscriptions.get(writer, set()).discard(session)
+        session.subscribers.clear()
+
+    def schedule(self, session):
+        """
+            Puts a session on the wheel at the step where its piece next falls or locks.
+            An earlier entry for it is left on the wheel and ignored when it comes up.
+
+            Parameters:
+                session (Session): The session
+
+            Returns:
+                None
+        """
+        steps = session.engine.steps_to_event()
+        session.due = None if steps is None else self.tick + steps
+        if session.due is not None:
+            self.wheel.schedule(session, session.due)
+
+    def apply(self, session, action):
+        """
+            Applies an action to a session, between steps.
+
+            Parameters:
+                session (Session): The session
+                action (str): One of engine.ACTIONS
+
+            Returns:
+                None
+        """
+        session.catch_up(self.tick)
+        session.engine.apply(action)
+        self.schedule(session)
+        self.publish(session)
+
+    def step(self, due_at=None):
+        """
+            Runs one logic step for every session that is woken on it.
+
+            Parameters:
+                due_at (int): perf_counter_ns time the step was due, for the tick
+                    latencies, None to not measure them
+
+            Returns:
+                int: Number of sessions that ran
+        """
+        ran = 0
+        for session in self.wheel.advance():
+            if session.due != self.tick:
+                continue
+            try:
+                session.catch_up(self.tick - 1)
+                session.engine.advance()
+                self.schedule(session)
+                self.publish(session)
+            except Exception:
+                # One broken game must not stop gravity for every other session
+                self.close(session)
+                continue
+            if due_at is not None:
+                session.latencies.append(perf_counter_ns() - due_at)
+            ran += 1
+        return ran
+
+    def publish(self, session):
+        """
+            Pushes what changed in a session to its subscribers.
+
+            Parameters:
+                session (Session): The session
+
+            Returns:
+                None
+        """
+        if not session.subscribers:
+            return
+        message = session.delta()
+        if message is None:
+            return
+        for writer in list(session.subscribers):
+            if writer.transport.get_write_buffer_size() > MAX_BUFFER:
+                # Too slow to keep up, the other subscribers should not wait on it
+                self.disconnect(writer)
+                writer.close()
+            else:
+                writer.write(message)
+
+    def disconnect(self, writer):
+        """
+            Removes a connection from everything it subscribed to.
+
+            Parameters:
+                writer (asyncio.StreamWriter): The connection
+
+            Returns:
+                None
+        """
+        for session in self.subscriptions.pop(writer, ()):
+            session.subscribers.discard(writer)
+
+    def receive(self, body, writer):
+        """
+            Handles one message from a client.
+
+            Parameters:
+                body (bytes): The message without its length
+                writer (asyncio.StreamWriter): The connection it came from
+
+            Returns:
+                bytes: The framed reply, None if there is none
+        """
+        try:
+            if body[0] == CREATE:
+                _, seed = SESSION.unpack(body)
+                return frame(SESSION.pack(CREATED, self.create(seed).number))
+            if body[0] == ACTION:
+                _, number, action = ACTION_MESSAGE.unpack(body)
+                action = ACTIONS[action]
+            else:
+                _, number = SESSION.unpack(body)
+        except (IndexError, struct.error):
+            return frame(ERROR_MESSAGE.pack(ERROR, BAD_MESSAGE))
+        session = self.sessions.get(number)
+        if session is None:
+            return frame(ERROR_MESSAGE.pack(ERROR, UNKNOWN_SESSION))
+        if body[0] == ACTION:
+            self.apply(session, action)
+        elif body[0] == SUBSCRIBE:
+            session.catch_up(self.tick)
+            session.subscribers.add(writer)
+            self.subscriptions.setdefault(writer, set()).add(session)
+            return session.snapshot()
+        elif body[0] == CLOSE:
+            self.close(session)
+        elif body[0] == METRICS:
+            p50, p99 = session.percentiles()
+            return frame(METRICS_MESSAGE.pack(METRICS_REPLY, number, len(session.latencies), p50, p99))
+        else:
+            return frame(ERROR_MESSAGE.pack(ERROR, BAD_MESSAGE))
+        return None
+
+    async def handle(self, reader, writer):
+        """
+            Reads the messages of one connection until it closes.
+
+            Parameters:
+                reader (asyncio.StreamReader): The connection's input
+                writer (asyncio.StreamWriter): The connection's output
+
+            Returns:
+                None
+        """
+        try:
+            while True:
+                size, = FRAME.unpack(await reader.readexactly(FRAME.size))
+                reply = self.receive(await reader.readexactly(size), writer)
+                if reply is not None:
+                    writer.write(reply)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.disconnect(writer)
+            writer.close()
+
+    async def run(self):
+        """
+            Runs the logic steps in real time, forever.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        step_ns = self.timestep.step_ns
+        while True:
+            steps = self.timestep.due()
+            # When the last of the due steps was due
+            last_due = self.timestep.last - self.timestep.accumulator
+            for number in range(steps):
+                self.step(last_due - (steps - 1 - number) * step_ns)
+            await asyncio.sleep(max(0, step_ns - self.timestep.accumulator) / 1e9)
+
+    async def serve(self, host="127.0.0.1", port=7000, unix=None):
+        """
+            Accepts connections and runs the logic steps, forever.
+
+            Parameters:
+                host (str): Address to listen on
+                port (int): TCP port to listen on
+                unix (str): Path of a Unix socket to listen on instead of TCP
+
+            Returns:
+                None
+        """
+        if unix:
+            listener = await asyncio.start_unix_server(self.handle, unix)
+        else:
+            listener = await asyncio.start_server(self.handle, host, port)
+        async with listener:
+            await self.run()
+
+
+class Client:
+    def __init__(self, reader, writer):
+        """
+            A connection to the server, for bots and tests.
+
+            Parameters:
+                reader (asyncio.StreamReader): The connection's input
+                writer (asyncio.StreamWriter): The connection's output
+
+            Returns:
+                None
+        """
+        self.reader = reader
+        self.writer = writer
+        # Messages read while waiting for a reply
+        self.pending = deque()
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=7000, unix=None):
+        """
+            Connects to a server.
+
+            Parameters:
+                host (str): The server's address
+                port (int): The server's TCP port
+                unix (str): Path of the server's Unix socket, used instead of TCP
+
+            Returns:
+                Client: The connection
+        """
+        if unix:
+            return cls(*await asyncio.open_unix_connection(unix))
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def read(self):
+        """
+            Returns the next message from the server.
+
+            Parameters:
+                None
+
+            Returns:
+                bytes: The message without its length
+        """
+        if self.pending:
+            return self.pending.popleft()
+        size, = FRAME.unpack(await self.reader.readexactly(FRAME.size))
+        return await self.reader.readexactly(size)
+
+    async def reply(self, kind):
+        """
+            Waits for a message of one type, keeping the others for read.
+
+            Parameters:
+                kind (int): The message type, ERROR is returned as well
+
+            Returns:
+                bytes: The message
+        """
+        skipped = []
+        while True:
+            size, = FRAME.unpack(await self.reader.readexactly(FRAME.size))
+            body = await self.reader.readexactly(size)
+            if body[0] in (kind, ERROR):
+                self.pending.extend(skipped)
+                return body
+            skipped.append(body)
+
+    async def create(self, seed):
+        """
+            Starts a session.
+
+            Parameters:
+                seed (int): Seed for the pieces
+
+            Returns:
+                int: The session id
+        """
+        self.writer.write(frame(SESSION.pack(CREATE, seed)))
+        return SESSION.unpack(await self.reply(CREATED))[1]
+
+    def action(self, session, action):
+        """
+            Sends an action, there is no reply.
+
+            Parameters:
+                session (int): The session id
+                action (str): One of engine.ACTIONS
+
+            Returns:
+                None
+        """
+        self.writer.write(frame(ACTION_MESSAGE.pack(ACTION, session, ACTIONS.index(action))))
+
+    async def subscribe(self, session):
+        """
+            Subscribes to a session.
+
+            Parameters:
+                session (int): The session id
+
+            Returns:
+                tuple: The full state, see decode_state
+        """
+        self.writer.write(frame(SESSION.pack(SUBSCRIBE, session)))
+        return decode_state(await self.reply(STATE))
+
+    def close(self):
+        """
+            Closes the connection.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        self.writer.close()
+
+
+def bench(sessions, seconds, actions_per_step, seed=0):
+    """
+        Runs many sessions as fast as possible without sockets, with random actions
+        sent to some of them every step.
+
+        Parameters:
+            sessions (int): Number of sessions
+            seconds (float): Game time played
+            actions_per_step (int): Actions applied to random sessions each step
+            seed (int): Seed for the sessions and actions
+
+        Returns:
+            dict: Steps run, sessions woken and step times in nanoseconds
+    """
+    rng = random.Random(seed)
+    server = Server()
+    # Sessions join over the first second, as they would on a real server,
+    # instead of all falling on the same steps
+    per_step = -(-sessions // TICKS_PER_SECOND)
+    for number in range(sessions):
+        if number and number % per_step == 0:
+            server.step()
+        server.create(seed + number)
+    live = list(server.sessions.values())
+    times = []
+    woken = 0
+    for _ in range(int(seconds * TICKS_PER_SECOND)):
+        start = perf_counter_ns()
+        for _ in range(actions_per_step):
+            server.apply(rng.choice(live), rng.choice(("left", "right", "rotate", "down", "drop")))
+        woken += server.step()
+        times.append(perf_counter_ns() - start)
+    return {"steps": len(times), "woken": woken, "times": times}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host many headless games.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7000)
+    parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--bench", type=int, help="time this many sessions without sockets and exit")
+    parser.add_argument("--seconds", type=float, default=10, help="game time played by --bench")
+    parser.add_argument("--actions", type=int, default=50, help="actions per step in --bench")
+    args = parser.parse_args()
+
+    if args.bench:
+        start = time.perf_counter()
+        result = bench(args.bench, args.seconds, args.actions)
+        elapsed = time.perf_counter() - start
+        times = sorted(result["times"])
+        budget = 1e9 / TICKS_PER_SECOND
+        print(f"{args.bench} sessions, {result['steps']} steps in {elapsed:.2f}s, "
+              f"{result['woken'] / result['steps']:.1f} sessions woken per step")
+        print(f"step p50 {times[len(times) // 2] / 1e3:.0f} us, p99 {times[len(times) * 99 // 100] / 1e3:.0f} us, "
+              f"{sum(times) / len(times) / budget:.1%} of one core at {TICKS_PER_SECOND} steps/s")
+        return
+    asyncio.run(Server().serve(args.host, args.port, args.unix))
+
+
+if __name__ == '__main__':
+    main()
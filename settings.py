@@ -1,9 +1,3 @@
-import pygame
-
-# Sets up pygame
-pygame.init()
-pygame.font.init()
-
 # All global variables that we will use
 WIDTH = 10
 HEIGHT = 20
@@ -15,13 +9,18 @@ SIDE_WIDTH = 200
 WINDOW_WIDTH = GRID_WIDTH + SIDE_WIDTH
 WINDOW_HEIGHT = GRID_HEIGHT
 
+# Bigger boards get smaller cells so the window fits in this size, cells are never
+# smaller than MIN_CELL_SIZE
+MAX_WINDOW_WIDTH = 1920
+MAX_WINDOW_HEIGHT = 1080
+MIN_CELL_SIZE = 2
+
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 GRAY = (100, 100, 100)
 BLUE = (173, 216, 230)
 
-# Sets the grid up 
-grid = [[0 for _ in range(WIDTH)] for _ in range(HEIGHT)]
+FONT_NAME = 'Times New Roman'
 
 # Tetrimino shapes
 SHAPES = [
@@ -46,13 +45,21 @@ COLORS = [
     (255, 165, 0)
 ]
 
-BLOCK_TEXTURES = {
-    "0": pygame.transform.scale(pygame.image.load('images/black_background.png'), (CELL_SIZE, CELL_SIZE)),
-    "1": pygame.transform.scale(pygame.image.load('images/light_blue_block.png'), (CELL_SIZE, CELL_SIZE)),
-    "2": pygame.transform.scale(pygame.image.load('images/yellow_block.png'), (CELL_SIZE, CELL_SIZE)),
-    "3": pygame.transform.scale(pygame.image.load('images/purple_block.png'), (CELL_SIZE, CELL_SIZE)),
-    "4": pygame.transform.scale(pygame.image.load('images/green_block.png'), (CELL_SIZE, CELL_SIZE)),
-    "5": pygame.transform.scale(pygame.image.load('images/red_block.png'), (CELL_SIZE, CELL_SIZE)),
-    "6": pygame.transform.scale(pygame.image.load('images/dark_blue_block.png'), (CELL_SIZE, CELL_SIZE)),
-    "7": pygame.transform.scale(pygame.image.load('images/orange_block.png'), (CELL_SIZE, CELL_SIZE)),
-}
+# Image used for each color number, loaded by textures.py
+TEXTURE_FILES = [
+    'images/black_background.png',
+    'images/light_blue_block.png',
+    'images/yellow_block.png',
+    'images/purple_block.png',
+    'images/green_block.png',
+    'images/red_block.png',
+    'images/dark_blue_block.png',
+    'images/orange_block.png',
+]
+
+# Key repeat, in milliseconds: delayed auto shift before a held left or right key
+# repeats, then one move every ARR (0 slides straight to the wall), and one row
+# every SOFT_DROP while down is held
+DAS = 167
+ARR = 33
+SOFT_DROP = 33
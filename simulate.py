@@ -0,0 +1,230 @@
+"""
+    Plays many headless games across several processes and prints statistics about them.
+    Game i is played with seed --seed + i, so any game can be replayed on its own.
+
+    Run with: python simulate.py --games 100 --workers 4 --seed 1 --policy random
+    A policy can be one of POLICIES or "module:function" for a function of (engine, rng)
+    that returns one of engine.ACTIONS.
+"""
+import argparse
+import importlib
+import json
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from engine import Engine
+from ai import ai_policy
+
+
+def random_policy(engine, rng):
+    """
+        Presses random keys, leaning towards moving the piece down.
+
+        Parameters:
+            engine (Engine): The game being played
+            rng (random.Random): The policy's own random generator
+
+        Returns:
+            str: The action to apply
+    """
+    return rng.choice(("left", "right", "rotate", "down", "down", "drop"))
+
+
+def drop_policy(engine, rng):
+    """
+        Hard drops every piece where it spawns.
+
+        Parameters:
+            engine (Engine): The game being played
+            rng (random.Random): The policy's own random generator
+
+        Returns:
+            str: The action to apply
+    """
+    return "drop"
+
+
+POLICIES = {
+    "random": random_policy,
+    "drop": drop_policy,
+    "ai": ai_policy,
+}
+
+
+def load_policy(name):
+    """
+        Finds a policy by its name in POLICIES or by a "module:function" path.
+
+        Parameters:
+            name (str): The policy name
+
+        Returns:
+            function: The policy
+    """
+    if name in POLICIES:
+        return POLICIES[name]
+    module_name, _, function_name = name.partition(":")
+    if not function_name:
+        raise ValueError(f"unknown policy {name!r}, use one of {sorted(POLICIES)} or module:function")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def play_game(seed, policy_name, max_pieces, gravity, mode="bag"):
+    """
+        Plays one game to the end, or until max_pieces have locked.
+
+        Parameters:
+            seed (int): Seed of the game's pieces and of the policy's generator
+            policy_name (str): Name passed to load_policy
+            max_pieces (int): Pieces after which the game is stopped
+            gravity (int): Number of actions between gravity ticks
+            mode (str): "bag" or "random", see Randomizer
+
+        Returns:
+            dict: The seed, score, lines, pieces, actions and duration of the game
+    """
+    policy = load_policy(policy_name)
+    engine = Engine(seed, mode=mode)
+    rng = random.Random(f"policy-{seed}")
+    actions = 0
+    start = time.perf_counter()
+    while not engine.game_over and engine.pieces_locked < max_pieces:
+        engine.apply(policy(engine, rng))
+        actions += 1
+        if actions % gravity == 0:
+            engine.tick()
+    return {
+        "seed": seed,
+        "score": engine.score,
+        "lines": engine.lines_cleared,
+        "pieces": engine.pieces_locked,
+        "actions": actions,
+        "duration": time.perf_counter() - start,
+    }
+
+
+def histogram(values, bins=10):
+    """
+        Counts values into equal width bins.
+
+        Parameters:
+            values (list): The numbers to count
+            bins (int): Number of bins
+
+        Returns:
+            list: (low, high, count) for every bin
+    """
+    low, high = min(values), max(values)
+    width = (high - low) / bins or 1
+    counts = [0] * bins
+    for value in values:
+        counts[min(int((value - low) / width), bins - 1)] += 1
+    return [(low + i * width, low + (i + 1) * width, count) for i, count in enumerate(counts)]
+
+
+def summarize(results):
+    """
+        Works out summary statistics and a histogram for each measured field.
+
+        Parameters:
+            results (list): Dicts returned by play_game
+
+        Returns:
+            dict: For score, lines, pieces and duration, their statistics and histogram
+    """
+    summary = {"games": len(results)}
+    for field in ("score", "lines", "pieces", "duration"):
+        values = [result[field] for result in results]
+        summary[field] = {
+            "mean": statistics.fmean(values),
+            "stdev": statistics.pstdev(values),
+            "min": min(values),
+            "median": statistics.median(values),
+            "max": max(values),
+            "histogram": histogram(values),
+        }
+    return summary
+
+
+def print_summary(summary, elapsed):
+    """
+        Prints the summary as a table followed by a text histogram of the scores.
+
+        Parameters:
+            summary (dict): The output of summarize
+            elapsed (float): Wall clock seconds the whole run took
+
+        Returns:
+            None
+    """
+    print(f"\n{summary['games']} games in {elapsed:.2f}s")
+    print(f"{'':10s}{'mean':>12s}{'stdev':>12s}{'min':>12s}{'median':>12s}{'max':>12s}")
+    for field in ("score", "lines", "pieces", "duration"):
+        stats = summary[field]
+        print(f"{field:10s}" + "".join(f"{stats[key]:12.2f}" for key in ("mean", "stdev", "min", "median", "max")))
+    print("\nscore histogram:")
+    histogram_rows = summary["score"]["histogram"]
+    most = max(count for _, _, count in histogram_rows)
+    for low, high, count in histogram_rows:
+        print(f"{low:10.0f} - {high:10.0f} {count:6d} {'#' * (40 * count // most)}")
+
+
+def run(games, seed, policy_name, workers, max_pieces, gravity, mode="bag"):
+    """
+        Plays every game, printing each result as a JSON line as soon as it finishes.
+
+        Parameters:
+            games (int): Number of games
+            seed (int): Seed of the first game
+            policy_name (str): Name passed to load_policy
+            workers (int): Number of processes, 1 plays in this process
+            max_pieces (int): Pieces after which a game is stopped
+            gravity (int): Number of actions between gravity ticks
+            mode (str): "bag" or "random", see Randomizer
+
+        Returns:
+            list: The result of every game, in the order they finished
+    """
+    # Fails early on a bad policy name instead of in every worker
+    load_policy(policy_name)
+    results = []
+    if workers == 1:
+        for i in range(games):
+            results.append(play_game(seed + i, policy_name, max_pieces, gravity, mode))
+            print(json.dumps(results[-1]), flush=True)
+        return results
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(play_game, seed + i, policy_name, max_pieces, gravity, mode)
+                   for i in range(games)]
+        for future in as_completed(futures):
+            results.append(future.result())
+            print(json.dumps(results[-1]), flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play seeded headless games in parallel.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--policy", default="random")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-pieces", type=int, default=1000)
+    parser.add_argument("--gravity", type=int, default=10, help="actions between gravity ticks")
+    parser.add_argument("--mode", choices=("bag", "random"), default="bag")
+    parser.add_argument("--summary-json", help="also write the summary to this file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run(args.games, args.seed, args.policy, args.workers, args.max_pieces, args.gravity, args.mode)
+    summary = summarize(results)
+    print_summary(summary, time.perf_counter() - start)
+    if args.summary_json:
+        with open(args.summary_json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+"""
+    Saves the whole state of a game in a few dozen bytes, for saving and resuming,
+    rewinding and branching a search from any point.
+
+    A snapshot is the 12 byte SNAPSHOT_HEADER, then the piece position, score, lines
+    and ticks as varints (7 bits a byte), then the board from its highest filled row
+    down, 3 bits per cell (color numbers go up to 7). The number of rows is worked
+    out from the length, so an empty board adds nothing and a full default board 75
+    bytes. While the score is under 2**28, the lines under 2**14 and the ticks under
+    2**21 (9 hours of play) a snapshot is 98 bytes at most, and less the lower the
+    stack; larger counts take a byte more for every 7 bits. The randomizer is
+    stored as its generator state and the pieces dealt from it, and the level is
+    worked out from the lines. The randomizer mode, the board size and the
+    pieces_locked count are not stored, so a snapshot is restored into an engine
+    made with the same mode and board size.
+"""
+import struct
+from collections import deque
+
+import numpy as np
+
+from board import Board, cell_keys
+from engine import Engine, LINES_PER_LEVEL
+from piece import Piece
+
+# Randomizer state, pieces dealt from it, piece, hold, timer. The varints follow it
+SNAPSHOT_HEADER = struct.Struct("<QBBBB")
+# Flags in the piece byte, the low 5 bits are the shape and rotation
+HOLD_USED, GAME_OVER, PAUSED = 1 << 5, 1 << 6, 1 << 7
+NO_HOLD = 255
+# Set in the timer byte when it holds the lock timer. Engine.advance zeroes the gravity
+# timer while the piece rests and the lock timer while it falls, so one is always 0
+LOCK_TIMER = 1 << 7
+# Start of a snapshot file
+MAGIC = b"TSN2"
+# board.CELL_KEYS as an array, for hashing a restored board in one go
+KEY_ARRAY = np.zeros(0, np.uint64)
+
+
+def board_hash(filled):
+    """
+        Works out the Zobrist hash of a board from which of its cells are filled.
+
+        Parameters:
+            filled (numpy.ndarray): One bool per cell, row by row, for the whole board
+
+        Returns:
+            int: The same value as board.zobrist_hash
+    """
+    global KEY_ARRAY
+    if len(KEY_ARRAY) < len(filled):
+        KEY_ARRAY = np.array(cell_keys(len(filled)), np.uint64)
+    return int(np.bitwise_xor.reduce(KEY_ARRAY[:len(filled)][filled]))
+
+
+def write_varint(value, out, signed=False):
+    """
+        Appends a number 7 bits a byte, the high bit set on every byte but the last.
+
+        Parameters:
+            value (int): The number
+            out (bytearray): Where the bytes go
+            signed (bool): Zigzags the number first, so small ones of either sign stay short
+
+        Returns:
+            None
+    """
+    if signed:
+        value = value * 2 if value >= 0 else -value * 2 - 1
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, offset, signed=False):
+    """
+        Reads a number written by write_varint.
+
+        Parameters:
+            data (bytes): The snapshot
+            offset (int): Where the number starts
+            signed (bool): Whether it was written signed
+
+        Returns:
+            tuple: (the number, offset after it)
+    """
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            break
+    if signed:
+        value = (value >> 1) ^ -(value & 1)
+    return value, offset
+
+
+def snapshot(engine):
+    """
+        Encodes the state of a game.
+
+        Parameters:
+            engine (Engine): The game
+
+        Returns:
+            bytes: The snapshot
+    """
+    board = engine.board
+    first = 0
+    while first < board.height and not board.rows[first]:
+        first += 1
+    cells = np.frombuffer(board.colors, np.uint8)[first * board.width:]
+    # The low 3 bits of every color number, one after another
+    cells = np.packbits(np.unpackbits(cells[:, None], axis=1)[:, 5:]).tobytes()
+
+    piece = engine.current_piece
+    flags = ((HOLD_USED if engine.hold_used else 0) | (GAME_OVER if engine.game_over else 0)
+             | (PAUSED if engine.paused else 0))
+    hold = engine.hold_piece
+    state, dealt = engine.randomizer.get_state()
+    data = bytearray(SNAPSHOT_HEADER.pack(
+        state, dealt, piece.index | piece.rotation << 3 | flags,
+        NO_HOLD if hold is None else hold.index | hold.rotation << 3,
+        engine.lock_timer | LOCK_TIMER if engine.lock_timer else engine.gravity_timer))
+    write_varint(piece.x, data, True)
+    write_varint(piece.y, data, True)
+    for value in (engine.score, engine.lines_cleared, engine.ticks):
+        write_varint(value, data)
+    return bytes(data) + cells
+
+
+def restore(engine, data):
+    """
+        Puts a game back to the state of a snapshot.
+
+        Parameters:
+            engine (Engine): The game, with the same randomizer mode and board size
+                as the one the snapshot was taken of
+            data (bytes): The snapshot
+
+        Returns:
+            None
+    """
+    state, dealt, piece_byte, hold_byte, timer = SNAPSHOT_HEADER.unpack_from(data)
+    x, offset = read_varint(data, SNAPSHOT_HEADER.size, True)
+    y, offset = read_varint(data, offset, True)
+    score, offset = read_varint(data, offset)
+    lines, offset = read_varint(data, offset)
+    ticks, offset = read_varint(data, offset)
+    board = engine.board
+    width = board.width
+    packed = np.frombuffer(data, np.uint8, offset=offset)
+    count = len(packed) * 8 // (3 * width)
+    bits = np.unpackbits(packed)[:count * width * 3].reshape(-1, 3)
+    cells = np.packbits(bits, axis=1)[:, 0] >> 5
+    filled = cells != 0
+    # Row masks can be wider than 64 bits, so each is made into a Python int from its bytes
+    masks = np.packbits(filled.reshape(count, width), axis=1, bitorder="little")
+    rows = [0] * (board.height - count) + [int.from_bytes(mask.tobytes(), "little") for mask in masks]
+    empty = (board.height - count) * width
+    board.restore(rows, bytes(empty) + cells.tobytes(),
+                  board_hash(np.concatenate((np.zeros(empty, bool), filled))))
+
+    engine.randomizer.set_state((state, dealt))
+    piece = Piece(piece_byte & 7, board)
+    piece.rotation = piece_byte >> 3 & 3
+    piece.x = x
+    piece.y = y
+    engine.current_piece = piece
+    if hold_byte == NO_HOLD:
+        engine.hold_piece = None
+    else:
+        engine.hold_piece = Piece(hold_byte & 7, board)
+        engine.hold_piece.rotation = hold_byte >> 3 & 3
+    engine.hold_used = bool(piece_byte & HOLD_USED)
+    engine.game_over = bool(piece_byte & GAME_OVER)
+    engine.paused = bool(piece_byte & PAUSED)
+    engine.gravity_timer = 0 if timer & LOCK_TIMER else timer
+    engine.lock_timer = timer & ~LOCK_TIMER if timer & LOCK_TIMER else 0
+    engine.score = score
+    engine.lines_cleared = lines
+    engine.level = 1 + lines // LINES_PER_LEVEL
+    engine.ticks = ticks
+
+
+def save(path, engine):
+    """
+        Writes a snapshot of a game to a file.
+
+        Parameters:
+            path (str): The file
+            engine (Engine): The game
+
+        Returns:
+            None
+    """
+    with open(path, "wb") as f:
+        f.write(MAGIC + snapshot(engine))
+
+
+def load(path, engine):
+    """
+        Puts a game back to the state saved in a file.
+
+        Parameters:
+            path (str): The file written by save
+            engine (Engine): The game
+
+        Returns:
+            None
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a snapshot file")
+    restore(engine, data[len(MAGIC):])
+
+
+class RewindBuffer:
+    def __init__(self, size=600):
+        """
+            Keeps the last size snapshots of a game, oldest dropped first.
+
+            Parameters:
+                size (int): Number of snapshots kept
+
+            Returns:
+                None
+        """
+        self.snapshots = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def push(self, engine):
+        """
+            Takes a snapshot of a game.
+
+            Parameters:
+                engine (Engine): The game
+
+            Returns:
+                None
+        """
+        self.snapshots.append(snapshot(engine))
+
+    def clear(self):
+        """
+            Forgets every snapshot.
+
+            Parameters:
+                None
+
+            Returns:
+                None
+        """
+        self.snapshots.clear()
+
+    def rewind(self, engine, steps=1):
+        """
+            Goes back steps snapshots and forgets the ones after it. The oldest
+            snapshot is kept, so rewinding further than that stops there.
+
+            Parameters:
+                engine (Engine): The game to put back
+                steps (int): Number of snapshots to go back
+
+            Returns:
+                Boolean: False if there was nothing to rewind to
+        """
+        if not self.snapshots:
+            return False
+        for _ in range(min(steps, len(self.snapshots) - 1)):
+            self.snapshots.pop()
+        restore(engine, self.snapshots[-1])
+        return True
+
+    def branch(self, engine, steps=0):
+        """
+            Makes a new game from an earlier snapshot, leaving the buffer as it is,
+            for trying out moves from there.
+
+            Parameters:
+                engine (Engine): A game with the randomizer mode and board size to use
+                steps (int): Number of snapshots back, 0 for the latest
+
+            Returns:
+                Engine: The new game
+        """
+        branch = Engine(0, Board(engine.board.width, engine.board.height), engine.randomizer.mode)
+        restore(branch, self.snapshots[-1 - steps])
+        return branch
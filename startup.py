@@ -0,0 +1,134 @@
+"""
+    Times how long the game and its tools take to start. Every measurement runs in a
+    new Python process, so nothing is already imported or cached on disk by Python.
+
+        import    the time to import a module headless, with no window
+        first     cold start of main.py to its first drawn frame, once without and once
+                  with the texture cache
+
+    Run with: python startup.py --runs 5 --import-budget 150 --first-frame-budget 1500
+    The run fails if an import or the first frame takes longer than its budget (ms).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Modules a headless tool or worker imports, and the one the game window needs
+MODULES = ("engine", "simulate", "replay", "batch", "game")
+
+
+def run_ms(args, cwd=None):
+    """
+        Runs a Python process headless and times it from start to exit.
+
+        Parameters:
+            args (list): Arguments after the python executable
+            cwd (str): Working directory, the game's folder if None
+
+        Returns:
+            float: Milliseconds the process took
+    """
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy",
+               PYGAME_HIDE_SUPPORT_PROMPT="1", PYTHONDONTWRITEBYTECODE="1")
+    env["PYTHONPATH"] = HERE + os.pathsep + env.get("PYTHONPATH", "")
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=cwd or HERE, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def import_ms(module, runs):
+    """
+        Times importing a module, less the time Python takes to start.
+
+        Parameters:
+            module (str): The module name
+            runs (int): Number of processes timed, the median is kept
+
+        Returns:
+            float: Milliseconds
+    """
+    empty = statistics.median(run_ms(["-c", "pass"]) for _ in range(runs))
+    return statistics.median(run_ms(["-c", f"import {module}"]) for _ in range(runs)) - empty
+
+
+def slowest_imports(module, count=5):
+    """
+        Finds the imports that take longest when a module is imported, from python -X importtime.
+
+        Parameters:
+            module (str): The module name
+            count (int): Number of imports listed
+
+        Returns:
+            list: (milliseconds including what it imports, module) tuples, slowest first
+    """
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=HERE, env=env, capture_output=True, text=True, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            times.append((int(parts[1]) / 1000, parts[2].strip()))
+    return sorted(times, reverse=True)[:count]
+
+
+def first_frame_ms(runs, texture_cache=None):
+    """
+        Times main.py from starting the process to its first frame. It runs in an
+        empty folder, so assets have to be found from the game's folder.
+
+        Parameters:
+            runs (int): Number of processes timed, the median is kept
+            texture_cache (str): Folder for the texture cache, None to not use one
+
+        Returns:
+            float: Milliseconds
+    """
+    args = [os.path.join(HERE, "main.py"), "--first-frame"]
+    if texture_cache:
+        args += ["--texture-cache", texture_cache]
+    with tempfile.TemporaryDirectory() as folder:
+        return statistics.median(run_ms(args, cwd=folder) for _ in range(runs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time imports and the first frame of the game.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget", type=float, help="most milliseconds a headless import may take")
+    parser.add_argument("--first-frame-budget", type=float, help="most milliseconds to the first frame")
+    args = parser.parse_args()
+
+    failures = []
+    for module in MODULES:
+        ms = import_ms(module, args.runs)
+        print(f"import {module:12s}{ms:9.1f} ms")
+        if args.import_budget is not None and module != "game" and ms > args.import_budget:
+            failures.append(f"import {module}")
+    for ms, name in slowest_imports("game"):
+        print(f"    {name:20s}{ms:9.1f} ms")
+
+    with tempfile.TemporaryDirectory() as cache:
+        # The first run fills the cache
+        first_frame_ms(1, cache)
+        timings = [("first frame", first_frame_ms(args.runs)),
+                   ("first frame, texture cache", first_frame_ms(args.runs, cache))]
+    for name, ms in timings:
+        print(f"{name:30s}{ms:9.1f} ms")
+        if args.first_frame_budget is not None and ms > args.first_frame_budget:
+            failures.append(name)
+
+    for name in failures:
+        print(f"{name} is over budget")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
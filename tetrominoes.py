@@ -0,0 +1,57 @@
+from collections import namedtuple
+
+from settings import WIDTH, SHAPES
+from board import shape_masks
+
+# One rotation state of a piece:
+#   shape   - the nested list shape, as it used to be stored on Piece
+#   cells   - (x, y) offsets of the filled cells from the top left corner
+#   masks   - row bitmasks used by Board for collisions
+#   width, height - size of the bounding box
+#   spawn_x - column the piece starts in on a default width board, see spawn_column
+#   bottoms - for each column of the box, the y offset of its lowest cell
+Rotation = namedtuple("Rotation", "shape cells masks width height spawn_x bottoms")
+
+# Offsets tried, in order, when a rotation collides. Only (0, 0) for now, wall kicks go here.
+KICKS = [(0, 0)]
+
+
+def build_rotations(shape):
+    """
+        Builds the four clockwise rotation states of a shape.
+
+        Parameters:
+            shape (list): The nested list shape of the piece in its spawn rotation
+
+        Returns:
+            list: Four Rotation entries, index 0 being the spawn rotation
+    """
+    states = []
+    for _ in range(4):
+        cells = tuple((j, i) for i, row in enumerate(shape) for j, cell in enumerate(row) if cell)
+        width = len(shape[0])
+        bottoms = tuple(max(y for x, y in cells if x == j) for j in range(width))
+        states.append(Rotation(shape, cells, shape_masks(shape), width, len(shape),
+                               WIDTH // 2 - width // 2, bottoms))
+        shape = [list(row) for row in zip(*shape[::-1])]
+    return states
+
+
+def spawn_column(state, width):
+    """
+        Finds the column a piece starts in, centred on a board of any width.
+
+        Parameters:
+            state (Rotation): The rotation the piece starts in
+            width (int): Columns of the board
+
+        Returns:
+            int: The x of the piece's left edge
+    """
+    return width // 2 - state.width // 2
+
+
+# Generated once: ROTATIONS[shape index][rotation index]
+ROTATIONS = [build_rotations(shape) for _, shape in SHAPES]
+LABELS = [label for label, _ in SHAPES]
+PIECE_COLORS = [max(max(row) for row in shape) for _, shape in SHAPES]
@@ -0,0 +1,146 @@
+import hashlib
+import os
+
+import pygame
+
+from settings import TEXTURE_FILES
+
+# Asset paths are relative to this file, so the game runs from any directory
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def asset_path(path):
+    """
+        Finds an asset file that ships with the game.
+
+        Parameters:
+            path (str): The path relative to the game's folder
+
+        Returns:
+            str: The absolute path
+    """
+    return os.path.join(ASSET_DIR, path)
+
+
+class TextureAtlas:
+    def __init__(self, files=TEXTURE_FILES, cache_dir=None):
+        """
+            Keeps the block images for every color number. Nothing is loaded until a
+            texture is first asked for. The images are then scaled once for each cell
+            size and packed side by side into one sheet, so drawing a cell is a plain
+            blit of an already scaled image.
+
+            Parameters:
+                files (list): Image file of each color number, relative to the game's folder
+                cache_dir (str): Folder where scaled sheets are kept between runs, None
+                    to always decode and scale the images
+
+            Returns:
+                None
+        """
+        self.files = [asset_path(path) for path in files]
+        self.cache_dir = cache_dir
+        self.images = None
+        self.converted = False
+        # Lists of textures indexed by color number, keyed by cell size
+        self.sizes = {}
+
+    def load(self):
+        """
+            Decodes the images, the first time it is called.
+
+            Parameters:
+                None
+
+            Returns:
+                list: The image of each color number
+        """
+        if self.images is None:
+            self.images = [pygame.image.load(path) for path in self.files]
+        return self.images
+
+    def convert(self):
+        """
+            Makes every sheet from now on use the pixel format of the window, so blitting
+            a texture does not convert every pixel again. Only possible once the window
+            is open.
+
+            Parameters:
+                None
+
+            Returns:
+                Boolean: True if sheets are converted from now on
+        """
+        if self.converted or pygame.display.get_surface() is None:
+            return False
+        self.converted = True
+        # Anything scaled before was in the old format
+        self.sizes = {}
+        return True
+
+    def cache_file(self, size):
+        """
+            Names the cached sheet for a cell size. The name changes whenever an image
+            file does, so a stale sheet is never read.
+
+            Parameters:
+                size (int): The cell size
+
+            Returns:
+                str: The path of the cached sheet
+        """
+        key = hashlib.sha1(str(size).encode())
+        for path in self.files:
+            stat = os.stat(path)
+            key.update(f"{path} {stat.st_size} {stat.st_mtime_ns}".encode())
+        return os.path.join(self.cache_dir, f"textures-{size}-{key.hexdigest()[:16]}.rgba")
+
+    def scale(self, size):
+        """
+            Draws every image at a cell size onto one sheet, reading it from the cache
+            folder when it is there and writing it there when it is not.
+
+            Parameters:
+                size (int): The cell size
+
+            Returns:
+                pygame.Surface: The sheet, one cell per color number from left to right
+        """
+        dimensions = (size * len(self.files), size)
+        path = self.cache_file(size) if self.cache_dir else None
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            if len(data) == dimensions[0] * dimensions[1] * 4:
+                return pygame.image.frombytes(data, dimensions, "RGBA")
+        sheet = pygame.Surface(dimensions, pygame.SRCALPHA)
+        for color, image in enumerate(self.load()):
+            sheet.blit(pygame.transform.scale(image, (size, size)), (color * size, 0))
+        if path:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(pygame.image.tobytes(sheet, "RGBA"))
+        return sheet
+
+    def at(self, size):
+        """
+            Returns the textures scaled to a cell size, scaling them the first time.
+
+            Parameters:
+                size (int): The width and height of a cell in pixels
+
+            Returns:
+                list: The texture of each color number
+        """
+        self.convert()
+        textures = self.sizes.get(size)
+        if textures is None:
+            sheet = self.scale(size)
+            if self.converted:
+                sheet = sheet.convert_alpha()
+            textures = [sheet.subsurface((color * size, 0, size, size)) for color in range(len(self.files))]
+            self.sizes[size] = textures
+        return textures
+
+
+BLOCK_TEXTURES = TextureAtlas()